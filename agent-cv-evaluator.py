@@ -1,12 +1,26 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+from fastapi import FastAPI, File, UploadFile, Form, Header, HTTPException
 from fastapi.responses import StreamingResponse
 from openai import OpenAI
-from typing import List, Dict, Optional
-from pydantic import BaseModel
-import json
-import PyPDF2
+from typing import List, Dict, Optional, Tuple
+from pydantic import BaseModel, Field
+import asyncio
+import hashlib
 import io
+import json
 import os
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import cv_prescreen
+from cv_normalization import PAGE_BREAK, normalize_cv_text
+from evaluation_store import EVALUATION_KINDS, EvaluationStore
+import pdf_extraction
+from llm_clients import close_async_openai, get_async_openai
+from pdf_extraction import PDFExtractionError, PDFTooLargeError
+from stream_framing import StreamRegistry, parse_event_id
+from tiered_cache import TieredCache
+
 class EvaluationCriteria(BaseModel):
     name: str
     weight: float
@@ -20,24 +34,92 @@ class CVEvaluationRequest(BaseModel):
 class MessageRequest(BaseModel):
     input: List[Dict[str, str]]
 
+class CandidateCV(BaseModel):
+    candidate_id: str
+    cv_text: str
+
+class BatchEvaluationRequest(BaseModel):
+    job_description: str
+    criteria: List[EvaluationCriteria]
+    cvs: List[CandidateCV]
+    max_concurrency: Optional[int] = None
+    prescreen_threshold: Optional[float] = None
+    shortlist_size: Optional[int] = Field(None, ge=1)
+
 app = FastAPI()
 client = OpenAI(
     api_key=os.environ.get("OPENAI_API_KEY", "")
 )
 
-def extract_text_from_pdf(pdf_file: bytes) -> str:
+EVALUATION_MODEL = os.environ.get("EVALUATION_MODEL", "gpt-4.1")
+
+# Bộ nhớ đệm kết quả đánh giá, khóa theo mã băm của CV, JD, tiêu chí và model
+evaluation_cache = TieredCache(
+    "evaluations",
+    ttl_seconds=float(os.environ.get("EVALUATION_CACHE_TTL", str(30 * 24 * 60 * 60))),
+    max_memory_items=int(os.environ.get("EVALUATION_CACHE_MEMORY_ITEMS", "256")),
+    max_disk_items=int(os.environ.get("EVALUATION_CACHE_DISK_ITEMS", "20000")),
+)
+
+# Lịch sử đánh giá lâu dài (SQLite), dùng lại kết quả khi bộ nhớ đệm đã hết hạn
+evaluation_store = EvaluationStore(os.environ.get("EVALUATION_DB_PATH"))
+
+# Các stream SSE đang chạy / vừa xong, để client có thể kết nối lại bằng Last-Event-ID
+sse_streams = StreamRegistry()
+
+# Số CV được đánh giá đồng thời trong chế độ hàng loạt
+BATCH_EVAL_CONCURRENCY = int(os.environ.get("BATCH_EVAL_CONCURRENCY", "8"))
+# Thread pool riêng cho chấm điểm hàng loạt, đủ BATCH_EVAL_CONCURRENCY luồng
+# (executor mặc định chỉ có min(32, cpu + 4) luồng dùng chung cho cả process)
+_batch_executor: Optional[ThreadPoolExecutor] = None
+# Giới hạn số file và tổng dung lượng giải nén của file ZIP CV
+BATCH_MAX_CVS = int(os.environ.get("BATCH_MAX_CVS", "500"))
+BATCH_MAX_ZIP_BYTES = int(os.environ.get("BATCH_MAX_ZIP_BYTES", str(500 * 1024 * 1024)))
+# Sàng lọc sơ bộ bằng TF-IDF trước khi gọi LLM (để trống = không sàng lọc)
+PRESCREEN_THRESHOLD = float(os.environ["PRESCREEN_THRESHOLD"]) if os.environ.get("PRESCREEN_THRESHOLD") else None
+PRESCREEN_SHORTLIST_SIZE = int(os.environ["PRESCREEN_SHORTLIST_SIZE"]) if os.environ.get("PRESCREEN_SHORTLIST_SIZE") else None
+
+# Số lần gọi LLM tối đa khi chấm điểm: lần đầu và một lần gọi lại cho các tiêu chí bị bỏ sót
+SCORING_ATTEMPTS = 2
+
+# Thang phân loại theo điểm tổng (ngưỡng dưới, nhãn)
+SCORE_BANDS = [(8.5, "Xuất sắc"), (7.0, "Tốt"), (5.5, "Khá"), (4.0, "Trung bình"), (0.0, "Yếu")]
+
+async def extract_cv_text(pdf_content: bytes) -> str:
+    """
+    Text CV với các trang ngăn cách bởi PAGE_BREAK, để bước chuẩn hóa nhận ra header/footer lặp lại ở đầu/cuối trang
     """
-    Trích xuất text từ file PDF
+    pages = await pdf_extraction.extract_pages_from_pdf_async(pdf_content)
+    return PAGE_BREAK.join(page.strip("\n") for page in pages).strip()
+
+async def extract_text_from_upload(file: UploadFile) -> str:
+    """
+    Đọc file upload theo từng phần và trích xuất text trong process pool (không chặn event loop)
     """
     try:
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_file))
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-        return text.strip()
-    except Exception as e:
+        pdf_content = await pdf_extraction.read_upload(file)
+        return await extract_cv_text(pdf_content)
+    except PDFTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except PDFExtractionError as e:
         raise HTTPException(status_code=400, detail=f"Lỗi đọc file PDF: {str(e)}")
 
+def sha256_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def criteria_hash(criteria: List[EvaluationCriteria]) -> str:
+    """
+    Mã băm của bộ tiêu chí (tên, trọng số, mô tả)
+    """
+    return sha256_text(json.dumps([criterion.model_dump() for criterion in criteria], ensure_ascii=False, sort_keys=True))
+
+def evaluation_cache_key(kind: str, cv_text: str, job_description: str, criteria: List[EvaluationCriteria]) -> str:
+    """
+    Khóa bộ nhớ đệm cho một lần đánh giá: loại kết quả + model + mã băm CV, JD, tiêu chí
+    """
+    parts = [kind, EVALUATION_MODEL, sha256_text(cv_text), sha256_text(job_description), criteria_hash(criteria)]
+    return sha256_text("|".join(parts))
+
 def create_evaluation_prompt(cv_text: str, job_description: str, criteria: List[EvaluationCriteria]) -> str:
     """
     Tạo prompt đánh giá CV với tiêu chí configurable
@@ -46,18 +128,11 @@ def create_evaluation_prompt(cv_text: str, job_description: str, criteria: List[
     for criterion in criteria:
         criteria_text += f"- {criterion.name} ({criterion.weight*100}%): {criterion.description}\n"
     
+    # Phần hướng dẫn cố định đứng đầu, rồi tới JD và tiêu chí, CV đặt cuối cùng
+    # để các lần đánh giá cùng một JD dùng chung prefix cache của nhà cung cấp
     prompt = f"""
 Bạn là một chuyên gia tuyển dụng và đánh giá CV chuyên nghiệp. Nhiệm vụ của bạn là đánh giá độ phù hợp của CV với tin tuyển dụng dựa trên các tiêu chí được cung cấp.
 
-**THÔNG TIN TUYỂN DỤNG:**
-{job_description}
-
-**TIÊU CHÍ ĐÁNH GIÁ:**
-{criteria_text}
-
-**NỘI DUNG CV:**
-{cv_text}
-
 **YÊU CẦU ĐÁNH GIÁ:**
 
 1. **Phân tích từng tiêu chí:**
@@ -102,13 +177,38 @@ Bạn là một chuyên gia tuyển dụng và đánh giá CV chuyên nghiệp.
 ```
 
 Hãy đánh giá một cách khách quan, công bằng và chi tiết.
+
+**THÔNG TIN TUYỂN DỤNG:**
+{job_description}
+
+**TIÊU CHÍ ĐÁNH GIÁ:**
+{criteria_text}
+
+**NỘI DUNG CV:**
+{cv_text}
 """
     return prompt
 
-def event_stream(cv_text: str, job_description: str, criteria: List[EvaluationCriteria]):
+async def evaluation_deltas(cv_text: str, job_description: str, criteria: List[EvaluationCriteria]):
     """
-    Stream đánh giá CV
+    Các đoạn text đánh giá CV từ model (phát lại từ bộ nhớ đệm hoặc lịch sử nếu đã có kết quả giống hệt).
+    Kết quả mới được lưu vào lịch sử đánh giá
     """
+    cv_hash, jd_hash, evaluation_criteria_hash = sha256_text(cv_text), sha256_text(job_description), criteria_hash(criteria)
+    cache_key = evaluation_cache_key("evaluation", cv_text, job_description, criteria)
+    # Bộ nhớ đệm có tầng SQLite trên đĩa: chạy trong thread để không chặn event loop
+    cached_result = await asyncio.to_thread(evaluation_cache.get, cache_key)
+    if cached_result is None:
+        stored = await asyncio.to_thread(
+            evaluation_store.latest, "evaluation", cv_hash, jd_hash, EVALUATION_MODEL, evaluation_criteria_hash
+        )
+        if stored:
+            cached_result = stored[0]["result_text"]
+            await asyncio.to_thread(evaluation_cache.set, cache_key, cached_result)
+    if cached_result is not None:
+        yield cached_result
+        return
+
     system_prompt = create_evaluation_prompt(cv_text, job_description, criteria)
     
     input_messages = [
@@ -122,15 +222,383 @@ def event_stream(cv_text: str, job_description: str, criteria: List[EvaluationCr
         }
     ]
     
-    stream = client.chat.completions.create(
-        model="gpt-4.1",
+    started = time.perf_counter()
+    stream = await get_async_openai().chat.completions.create(
+        model=EVALUATION_MODEL,
         messages=input_messages,
         stream=True,
+        stream_options={"include_usage": True},
     )
     
-    for chunk in stream:
-        if chunk.choices[0].delta.content is not None:
-            yield json.dumps({"delta": chunk.choices[0].delta.content}) + "\n"
+    result_parts = []
+    usage = None
+    async for chunk in stream:
+        # Chunk cuối chỉ chứa thông tin usage, không có choices
+        usage = getattr(chunk, "usage", None) or usage
+        if chunk.choices and chunk.choices[0].delta.content is not None:
+            result_parts.append(chunk.choices[0].delta.content)
+            yield chunk.choices[0].delta.content
+
+    # Chỉ lưu khi stream hoàn tất
+    result_text = "".join(result_parts)
+    await asyncio.to_thread(evaluation_cache.set, cache_key, result_text)
+    await asyncio.to_thread(
+        evaluation_store.record,
+        "evaluation", cv_hash, jd_hash, evaluation_criteria_hash,
+        [criterion.model_dump() for criterion in criteria], EVALUATION_MODEL,
+        result_text=result_text,
+        latency_ms=int((time.perf_counter() - started) * 1000),
+        prompt_tokens=usage.prompt_tokens if usage else None,
+        completion_tokens=usage.completion_tokens if usage else None,
+    )
+
+async def event_stream(cv_text: str, job_description: str, criteria: List[EvaluationCriteria]):
+    """
+    Stream đánh giá CV, mỗi đoạn text từ model là một dòng JSON {"delta": ...}
+    """
+    async for delta in evaluation_deltas(cv_text, job_description, criteria):
+        yield json.dumps({"delta": delta}) + "\n"
+
+def create_scoring_prompt(cv_text: str, job_description: str, criteria: List[EvaluationCriteria]) -> str:
+    """
+    Tạo prompt chấm điểm CV dạng JSON (điểm tổng được tính lại ở server).
+    Thứ tự giống create_evaluation_prompt: hướng dẫn, JD, tiêu chí rồi mới tới CV
+    """
+    criteria_text = ""
+    for criterion in criteria:
+        criteria_text += f"- {criterion.name}: {criterion.description}\n"
+    if not criteria:
+        criteria_text = "- (Không có tiêu chí cần chấm, `scores` để danh sách rỗng)\n"
+
+    return f"""
+Bạn là một chuyên gia tuyển dụng và đánh giá CV chuyên nghiệp. Nhiệm vụ của bạn là chấm điểm độ phù hợp của CV với tin tuyển dụng theo từng tiêu chí được cung cấp.
+
+**YÊU CẦU:**
+- Chấm điểm CV theo từng tiêu chí trên thang điểm 0-10 (có thể dùng số thập phân).
+- Giải thích ngắn gọn (1 câu) lý do cho mỗi điểm số.
+- Trả về kết quả dưới dạng một JSON object với các key:
+  - `candidate_name`: tên ứng viên (chuỗi rỗng nếu không tìm thấy)
+  - `scores`: danh sách object gồm `criterion` (giữ nguyên tên tiêu chí), `score` (số từ 0 đến 10) và `reason`
+  - `summary`: nhận xét tổng quan ngắn gọn về mức độ phù hợp
+
+Hãy đánh giá một cách khách quan, công bằng.
+
+**THÔNG TIN TUYỂN DỤNG:**
+{job_description}
+
+**TIÊU CHÍ ĐÁNH GIÁ:**
+{criteria_text}
+**NỘI DUNG CV:**
+{cv_text}
+"""
+
+def classify_score(total_score: float) -> str:
+    """
+    Phân loại điểm tổng theo thang Xuất sắc / Tốt / Khá / Trung bình / Yếu
+    """
+    for threshold, label in SCORE_BANDS:
+        if total_score >= threshold:
+            return label
+    return SCORE_BANDS[-1][1]
+
+def compute_weighted_score(scores: Dict[str, float], criteria: List[EvaluationCriteria]) -> float:
+    """
+    Tính điểm tổng theo trọng số từ điểm của từng tiêu chí
+    """
+    total = sum(criterion.weight * scores.get(criterion.name, 0.0) for criterion in criteria)
+    return round(total, 2)
+
+def criterion_cache_key(cv_text: str, job_description: str, criterion: EvaluationCriteria) -> str:
+    """
+    Khóa bộ nhớ đệm điểm của một tiêu chí: chỉ phụ thuộc CV, JD và mô tả tiêu chí (không phụ thuộc trọng số)
+    """
+    parts = ["criterion", EVALUATION_MODEL, sha256_text(cv_text), sha256_text(job_description), sha256_text(criterion.description)]
+    return sha256_text("|".join(parts))
+
+def load_stored_scores(cv_hash: str, jd_hash: str) -> Tuple[Dict[str, Dict], Optional[Dict]]:
+    """
+    Điểm từng tiêu chí (theo mô tả tiêu chí) và thông tin ứng viên từ các lần chấm đã lưu trong lịch sử
+    """
+    by_description, profile = {}, None
+    # Duyệt từ cũ tới mới để kết quả mới nhất được ưu tiên
+    for evaluation in reversed(evaluation_store.latest("scores", cv_hash, jd_hash, EVALUATION_MODEL, limit=20)):
+        for item in evaluation["scores"] or []:
+            # Bỏ qua tiêu chí không có điểm
+            if "description" not in item or item.get("score") is None:
+                continue
+            by_description[item["description"]] = {"score": item["score"], "reason": item.get("reason", "")}
+        profile = {"candidate_name": evaluation["candidate_name"] or "", "summary": evaluation["summary"] or ""}
+    return by_description, profile
+
+def score_cv(cv_text: str, job_description: str, criteria: List[EvaluationCriteria], candidate_id: Optional[str] = None) -> Dict:
+    """
+    Chấm điểm CV theo từng tiêu chí bằng LLM và tính điểm tổng, phân loại tại server.
+    Điểm từng tiêu chí được lưu đệm theo CV, JD và mô tả tiêu chí nên việc đổi trọng số
+    không gọi lại LLM; chỉ tiêu chí mới hoặc đã sửa mô tả mới được chấm lại.
+    Text CV được chuẩn hóa và cắt theo ngân sách token trước khi chấm.
+    Mỗi lần chấm bằng LLM được lưu vào lịch sử đánh giá
+    """
+    cv_text, cv_tokens = normalize_cv_text(cv_text)
+    cv_hash, jd_hash = sha256_text(cv_text), sha256_text(job_description)
+    criterion_keys = {criterion.name: criterion_cache_key(cv_text, job_description, criterion) for criterion in criteria}
+    cached_scores = {name: evaluation_cache.get(key) for name, key in criterion_keys.items()}
+    pending = [criterion for criterion in criteria if cached_scores[criterion.name] is None]
+    profile_key = evaluation_cache_key("profile", cv_text, job_description, [])
+    profile = evaluation_cache.get(profile_key)
+
+    if pending or profile is None:
+        stored_scores, stored_profile = load_stored_scores(cv_hash, jd_hash)
+        for criterion in pending:
+            if criterion.description in stored_scores:
+                cached_scores[criterion.name] = stored_scores[criterion.description]
+                evaluation_cache.set(criterion_keys[criterion.name], stored_scores[criterion.description])
+        pending = [criterion for criterion in pending if cached_scores[criterion.name] is None]
+        if profile is None and stored_profile is not None:
+            profile = stored_profile
+            evaluation_cache.set(profile_key, profile)
+
+    prompt_tokens, completion_tokens, latency_ms = None, None, None
+    attempts = 0
+    # Lần gọi đầu chấm mọi tiêu chí còn thiếu; nếu model bỏ sót tiêu chí nào thì gọi lại một lần cho riêng các tiêu chí đó
+    while attempts < SCORING_ATTEMPTS:
+        to_score = [criterion for criterion in pending if cached_scores[criterion.name] is None]
+        if not to_score and (attempts or profile is not None):
+            break
+        attempts += 1
+        started = time.perf_counter()
+        response = client.chat.completions.create(
+            model=EVALUATION_MODEL,
+            messages=[{"role": "user", "content": create_scoring_prompt(cv_text, job_description, to_score)}],
+            response_format={"type": "json_object"}
+        )
+        latency_ms = (latency_ms or 0) + int((time.perf_counter() - started) * 1000)
+        if response.usage:
+            prompt_tokens = (prompt_tokens or 0) + response.usage.prompt_tokens
+            completion_tokens = (completion_tokens or 0) + response.usage.completion_tokens
+        result = json.loads(response.choices[0].message.content)
+
+        pending_names = {criterion.name for criterion in to_score}
+        for item in result.get("scores", []):
+            try:
+                name = item["criterion"]
+                scored = {"score": min(10.0, max(0.0, float(item["score"]))), "reason": item.get("reason", "")}
+            except (KeyError, TypeError, ValueError):
+                continue
+            if name in pending_names:
+                cached_scores[name] = scored
+                evaluation_cache.set(criterion_keys[name], scored)
+        if profile is None:
+            profile = {"candidate_name": result.get("candidate_name", ""), "summary": result.get("summary", "")}
+            evaluation_cache.set(profile_key, profile)
+
+    scores = {name: item["score"] for name, item in cached_scores.items() if item is not None}
+    # Không tính điểm tổng từ điểm giả 0 khi model vẫn bỏ sót tiêu chí sau khi gọi lại
+    missing_criteria = [criterion.name for criterion in criteria if cached_scores[criterion.name] is None]
+    total_score = None if missing_criteria else compute_weighted_score(scores, criteria)
+    classification = None if total_score is None else classify_score(total_score)
+    score_items = [
+        {
+            "criterion": criterion.name,
+            "score": scores.get(criterion.name),
+            "reason": (cached_scores[criterion.name] or {}).get("reason", ""),
+        }
+        for criterion in criteria
+    ]
+
+    evaluation_id = None
+    if latency_ms is not None:
+        evaluation_id = evaluation_store.record(
+            "scores", cv_hash, jd_hash, criteria_hash(criteria),
+            [criterion.model_dump() for criterion in criteria], EVALUATION_MODEL,
+            candidate_id=candidate_id,
+            candidate_name=profile["candidate_name"],
+            # Chỉ lưu các tiêu chí thực sự có điểm từ model hoặc từ bộ nhớ đệm
+            scores=[
+                {**item, "description": criterion.description}
+                for item, criterion in zip(score_items, criteria)
+                if cached_scores[criterion.name] is not None
+            ],
+            total_score=total_score,
+            classification=classification,
+            summary=profile["summary"],
+            latency_ms=latency_ms,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+        )
+
+    return {
+        "candidate_name": profile["candidate_name"],
+        "scores": score_items,
+        "total_score": total_score,
+        "classification": classification,
+        "summary": profile["summary"],
+        "missing_criteria": missing_criteria,
+        "criteria_scored": len(pending) - len(missing_criteria),
+        "criteria_cached": len(criteria) - len(pending),
+        "cv_tokens": cv_tokens,
+        "evaluation_id": evaluation_id,
+        "cv_hash": cv_hash,
+        "jd_hash": jd_hash,
+    }
+
+def validate_evaluation_inputs(job_description: str, criteria: List[EvaluationCriteria]):
+    """
+    Kiểm tra JD và tiêu chí (tổng trọng số = 1.0)
+    """
+    if not job_description:
+        raise HTTPException(status_code=400, detail="Thiếu mô tả công việc")
+    
+    if not criteria:
+        raise HTTPException(status_code=400, detail="Thiếu tiêu chí đánh giá")
+    
+    # Kiểm tra tổng trọng số = 1.0
+    total_weight = sum(criterion.weight for criterion in criteria)
+    if abs(total_weight - 1.0) > 0.01:
+        raise HTTPException(status_code=400, detail=f"Tổng trọng số phải bằng 1.0, hiện tại: {total_weight}")
+
+def get_batch_executor() -> ThreadPoolExecutor:
+    global _batch_executor
+    if _batch_executor is None:
+        _batch_executor = ThreadPoolExecutor(max_workers=max(1, BATCH_EVAL_CONCURRENCY), thread_name_prefix="batch-eval")
+    return _batch_executor
+
+async def batch_event_stream(
+    cvs: List[CandidateCV],
+    job_description: str,
+    criteria: List[EvaluationCriteria],
+    concurrency: int,
+    failed: Optional[List[Tuple[str, str]]] = None,
+    prescreen_threshold: Optional[float] = None,
+    shortlist_size: Optional[int] = None,
+):
+    """
+    Đánh giá nhiều CV đồng thời (giới hạn bởi concurrency), stream kết quả ngay khi từng CV xong,
+    cuối cùng trả về bảng xếp hạng theo điểm tổng.
+    Nếu có prescreen_threshold/shortlist_size, CV được sàng lọc cục bộ bằng TF-IDF trước,
+    chỉ các CV lọt vào danh sách ngắn mới được gửi tới LLM
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    prescreen_scores: Dict[str, float] = {}
+
+    async def evaluate_one(candidate: CandidateCV) -> Dict:
+        async with semaphore:
+            try:
+                result = await asyncio.get_running_loop().run_in_executor(
+                    get_batch_executor(), score_cv, candidate.cv_text, job_description, criteria, candidate.candidate_id
+                )
+                if result.get("missing_criteria"):
+                    # Không xếp hạng CV thiếu điểm tiêu chí (điểm tổng không tính được)
+                    event = {
+                        "event": "error",
+                        "candidate_id": candidate.candidate_id,
+                        "detail": f"Model không chấm các tiêu chí: {', '.join(result['missing_criteria'])}",
+                        **result,
+                    }
+                else:
+                    event = {"event": "result", "candidate_id": candidate.candidate_id, **result}
+            except Exception as e:
+                event = {"event": "error", "candidate_id": candidate.candidate_id, "detail": str(e)}
+            if candidate.candidate_id in prescreen_scores:
+                event["prescreen_score"] = prescreen_scores[candidate.candidate_id]
+            return event
+
+    screened_out = []
+    if prescreen_threshold is not None or shortlist_size is not None:
+        kept, dropped = await asyncio.to_thread(
+            cv_prescreen.shortlist, [candidate.cv_text for candidate in cvs], job_description, prescreen_threshold, shortlist_size
+        )
+        for index, score in kept + dropped:
+            prescreen_scores[cvs[index].candidate_id] = score
+        screened_out = [(cvs[index], score) for index, score in dropped]
+        cvs = [cvs[index] for index, _ in kept]
+
+    started = {"event": "started", "total": len(cvs) + len(screened_out) + len(failed or []), "concurrency": concurrency}
+    if prescreen_scores:
+        started["shortlisted"] = len(cvs)
+    yield json.dumps(started, ensure_ascii=False) + "\n"
+    for candidate_id, detail in failed or []:
+        yield json.dumps({"event": "error", "candidate_id": candidate_id, "detail": detail}, ensure_ascii=False) + "\n"
+    for candidate, score in screened_out:
+        yield json.dumps({"event": "screened_out", "candidate_id": candidate.candidate_id, "prescreen_score": score}, ensure_ascii=False) + "\n"
+
+    tasks = [asyncio.create_task(evaluate_one(candidate)) for candidate in cvs]
+    results = []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            event = await next_done
+            if event["event"] == "result":
+                results.append(event)
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+    finally:
+        # Dừng các đánh giá còn lại nếu client ngắt kết nối
+        for task in tasks:
+            task.cancel()
+
+    results.sort(key=lambda item: item["total_score"], reverse=True)
+    leaderboard = [
+        {
+            "rank": rank,
+            "candidate_id": item["candidate_id"],
+            "candidate_name": item["candidate_name"],
+            "total_score": item["total_score"],
+            "classification": item["classification"],
+        }
+        for rank, item in enumerate(results, start=1)
+    ]
+    yield json.dumps({"event": "leaderboard", "ranking": leaderboard}, ensure_ascii=False) + "\n"
+
+async def extract_batch_uploads(files: List[UploadFile]) -> Tuple[List[CandidateCV], List[Tuple[str, str]]]:
+    """
+    Trích xuất text từ danh sách file PDF và/hoặc file ZIP chứa PDF.
+    Trả về các CV hợp lệ và danh sách (tên file, lỗi) của các file không đọc được
+    """
+    documents: List[Tuple[str, bytes]] = []
+    for file in files:
+        try:
+            content = await pdf_extraction.read_upload(file, max_bytes=BATCH_MAX_ZIP_BYTES)
+        except PDFTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        name = file.filename or "cv.pdf"
+        if name.lower().endswith(".zip"):
+            try:
+                with zipfile.ZipFile(io.BytesIO(content)) as archive:
+                    entries = [
+                        info for info in archive.infolist()
+                        if not info.is_dir() and info.filename.lower().endswith(".pdf")
+                        and not os.path.basename(info.filename).startswith(".")
+                    ]
+                    if sum(info.file_size for info in entries) > BATCH_MAX_ZIP_BYTES:
+                        raise HTTPException(status_code=413, detail="Dung lượng giải nén của file ZIP vượt quá giới hạn")
+                    documents.extend((info.filename, archive.read(info)) for info in entries)
+            except zipfile.BadZipFile:
+                raise HTTPException(status_code=400, detail=f"File ZIP không hợp lệ: {name}")
+        elif name.lower().endswith(".pdf"):
+            documents.append((name, content))
+        if len(documents) > BATCH_MAX_CVS:
+            raise HTTPException(status_code=413, detail=f"Tối đa {BATCH_MAX_CVS} CV mỗi lần đánh giá")
+
+    async def extract_one(name: str, content: bytes):
+        try:
+            return name, await extract_cv_text(content), None
+        except PDFExtractionError as e:
+            return name, "", f"Lỗi đọc file PDF: {str(e)}"
+
+    cvs, failed = [], []
+    for name, cv_text, error in await asyncio.gather(*(extract_one(name, content) for name, content in documents)):
+        if error or not cv_text.strip():
+            failed.append((name, error or "Không thể trích xuất text từ file PDF"))
+        else:
+            cvs.append(CandidateCV(candidate_id=name, cv_text=cv_text))
+    return cvs, failed
+
+@app.on_event("shutdown")
+async def shutdown_workers():
+    global _batch_executor
+    pdf_extraction.shutdown_process_pool()
+    if _batch_executor is not None:
+        _batch_executor.shutdown(wait=False, cancel_futures=True)
+        _batch_executor = None
+    await close_async_openai()
 
 @app.post("/upload-cv")
 async def upload_cv(file: UploadFile = File(...)):
@@ -141,8 +609,7 @@ async def upload_cv(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="Chỉ chấp nhận file PDF")
     
     try:
-        pdf_content = await file.read()
-        cv_text = extract_text_from_pdf(pdf_content)
+        cv_text = await extract_text_from_upload(file)
         
         if not cv_text.strip():
             raise HTTPException(status_code=400, detail="Không thể trích xuất text từ file PDF")
@@ -152,33 +619,185 @@ async def upload_cv(file: UploadFile = File(...)):
             "cv_text": cv_text,
             "message": "Upload CV thành công"
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lỗi xử lý file: {str(e)}")
 
 @app.post("/evaluate-cv")
 def evaluate_cv(request: CVEvaluationRequest):
     """
-    Đánh giá CV với streaming response
+    Đánh giá CV với streaming response.
+    Số token của CV trước/sau khi chuẩn hóa được trả về trong header X-CV-Tokens-Before/After
     """
     if not request.cv_text:
         raise HTTPException(status_code=400, detail="Thiếu nội dung CV")
     
-    if not request.job_description:
-        raise HTTPException(status_code=400, detail="Thiếu mô tả công việc")
+    validate_evaluation_inputs(request.job_description, request.criteria)
     
-    if not request.criteria:
-        raise HTTPException(status_code=400, detail="Thiếu tiêu chí đánh giá")
+    cv_text, cv_tokens = normalize_cv_text(request.cv_text)
+    return StreamingResponse(
+        event_stream(cv_text, request.job_description, request.criteria),
+        media_type="application/json",
+        headers={
+            "X-CV-Tokens-Before": str(cv_tokens["tokens_before"]),
+            "X-CV-Tokens-After": str(cv_tokens["tokens_after"]),
+        }
+    )
+
+@app.post("/evaluate-cv/sse")
+async def evaluate_cv_sse(request: CVEvaluationRequest):
+    """
+    Đánh giá CV dạng Server-Sent Events: các token được gộp lại theo khung thời gian ngắn
+    hoặc theo kích thước trước khi gửi. Mỗi sự kiện có id "<stream_id>:<số thứ tự>";
+    nếu mất kết nối, gọi GET /evaluate-cv/sse/{stream_id} kèm header Last-Event-ID để nhận tiếp
+    """
+    if not request.cv_text:
+        raise HTTPException(status_code=400, detail="Thiếu nội dung CV")
     
-    # Kiểm tra tổng trọng số = 1.0
-    total_weight = sum(criterion.weight for criterion in request.criteria)
-    if abs(total_weight - 1.0) > 0.01:
-        raise HTTPException(status_code=400, detail=f"Tổng trọng số phải bằng 1.0, hiện tại: {total_weight}")
+    validate_evaluation_inputs(request.job_description, request.criteria)
+    
+    cv_text, cv_tokens = normalize_cv_text(request.cv_text)
+    stream = sse_streams.start(evaluation_deltas(cv_text, request.job_description, request.criteria))
+    return StreamingResponse(
+        stream.frames_after(0),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Stream-Id": stream.stream_id,
+            "X-CV-Tokens-Before": str(cv_tokens["tokens_before"]),
+            "X-CV-Tokens-After": str(cv_tokens["tokens_after"]),
+        }
+    )
+
+@app.get("/evaluate-cv/sse/{stream_id}")
+async def resume_evaluate_cv_sse(stream_id: str, last_event_id: Optional[str] = Header(None, alias="Last-Event-ID")):
+    """
+    Nối lại một stream SSE: gửi các sự kiện sau Last-Event-ID rồi tiếp tục stream trực tiếp
+    """
+    stream = sse_streams.get(stream_id)
+    if stream is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy stream hoặc stream đã hết hạn")
     
+    resume_stream_id, seq = parse_event_id(last_event_id)
+    if resume_stream_id != stream_id:
+        seq = 0
     return StreamingResponse(
-        event_stream(request.cv_text, request.job_description, request.criteria),
+        stream.frames_after(seq),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Stream-Id": stream_id}
+    )
+
+@app.post("/evaluate-cv/scores")
+def evaluate_cv_scores(request: CVEvaluationRequest):
+    """
+    Chấm điểm CV dạng JSON theo từng tiêu chí (0-10), kèm điểm tổng và phân loại.
+    Trả về cả thang phân loại để client tự tính lại điểm tổng khi chỉ thay đổi trọng số
+    """
+    if not request.cv_text:
+        raise HTTPException(status_code=400, detail="Thiếu nội dung CV")
+    
+    validate_evaluation_inputs(request.job_description, request.criteria)
+    
+    try:
+        result = score_cv(request.cv_text, request.job_description, request.criteria)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Lỗi chấm điểm CV: {str(e)}")
+    return {**result, "score_bands": SCORE_BANDS}
+
+@app.post("/evaluate-cv/batch")
+async def evaluate_cv_batch(request: BatchEvaluationRequest):
+    """
+    Đánh giá nhiều CV với cùng một JD và bộ tiêu chí, stream kết quả từng CV và bảng xếp hạng cuối cùng
+    """
+    if not request.cvs:
+        raise HTTPException(status_code=400, detail="Thiếu danh sách CV")
+    if len(request.cvs) > BATCH_MAX_CVS:
+        raise HTTPException(status_code=413, detail=f"Tối đa {BATCH_MAX_CVS} CV mỗi lần đánh giá")
+    validate_evaluation_inputs(request.job_description, request.criteria)
+
+    concurrency = min(request.max_concurrency or BATCH_EVAL_CONCURRENCY, BATCH_EVAL_CONCURRENCY)
+    return StreamingResponse(
+        batch_event_stream(
+            request.cvs, request.job_description, request.criteria, concurrency,
+            prescreen_threshold=request.prescreen_threshold if request.prescreen_threshold is not None else PRESCREEN_THRESHOLD,
+            shortlist_size=request.shortlist_size if request.shortlist_size is not None else PRESCREEN_SHORTLIST_SIZE,
+        ),
         media_type="application/json"
     )
 
+@app.post("/evaluate-cv/batch-upload")
+async def evaluate_cv_batch_upload(
+    files: List[UploadFile] = File(...),
+    job_description: str = Form(...),
+    criteria: str = Form(...),
+    max_concurrency: Optional[int] = Form(None),
+    prescreen_threshold: Optional[float] = Form(None),
+    shortlist_size: Optional[int] = Form(None, ge=1),
+):
+    """
+    Đánh giá hàng loạt từ các file PDF hoặc file ZIP chứa PDF.
+    `criteria` là chuỗi JSON của danh sách tiêu chí đánh giá
+    """
+    try:
+        criteria_list = [EvaluationCriteria(**item) for item in json.loads(criteria)]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Tiêu chí đánh giá không hợp lệ")
+    validate_evaluation_inputs(job_description, criteria_list)
+
+    cvs, failed = await extract_batch_uploads(files)
+    if not cvs and not failed:
+        raise HTTPException(status_code=400, detail="Không tìm thấy file PDF nào")
+
+    concurrency = min(max_concurrency or BATCH_EVAL_CONCURRENCY, BATCH_EVAL_CONCURRENCY)
+    return StreamingResponse(
+        batch_event_stream(
+            cvs, job_description, criteria_list, concurrency, failed,
+            prescreen_threshold=prescreen_threshold if prescreen_threshold is not None else PRESCREEN_THRESHOLD,
+            shortlist_size=shortlist_size if shortlist_size is not None else PRESCREEN_SHORTLIST_SIZE,
+        ),
+        media_type="application/json"
+    )
+
+@app.get("/evaluations")
+def list_evaluations(
+    jd_hash: Optional[str] = None,
+    cv_hash: Optional[str] = None,
+    kind: Optional[str] = None,
+    limit: int = 50,
+    offset: int = 0,
+):
+    """
+    Danh sách các lần đánh giá đã lưu (mới nhất trước), lọc theo mã băm JD/CV và loại kết quả
+    """
+    if kind is not None and kind not in EVALUATION_KINDS:
+        raise HTTPException(status_code=422, detail=f"Loại kết quả không hợp lệ, chỉ chấp nhận: {', '.join(EVALUATION_KINDS)}")
+    return {"evaluations": evaluation_store.list(jd_hash, cv_hash, kind, min(max(1, limit), 500), max(0, offset))}
+
+@app.get("/evaluations/top")
+def top_evaluations(jd_hash: str, limit: int = 10, criteria_hash: Optional[str] = None):
+    """
+    Các ứng viên có điểm tổng cao nhất cho một JD (mỗi CV lấy lần chấm điểm cao nhất)
+    """
+    return {"jd_hash": jd_hash, "ranking": evaluation_store.top_for_jd(jd_hash, min(max(1, limit), 500), criteria_hash)}
+
+@app.get("/evaluations/{evaluation_id}")
+def get_evaluation(evaluation_id: int):
+    """
+    Chi tiết một lần đánh giá đã lưu
+    """
+    evaluation = evaluation_store.get(evaluation_id)
+    if evaluation is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy kết quả đánh giá")
+    return evaluation
+
+@app.get("/evaluation-cache/stats")
+def get_evaluation_cache_stats():
+    """
+    Thống kê hit/miss của bộ nhớ đệm kết quả đánh giá
+    """
+    return evaluation_cache.stats()
+
 @app.get("/default-criteria")
 def get_default_criteria():
     """
@@ -219,7 +838,7 @@ def stream_response(request: MessageRequest):
     """
     Endpoint tương thích với agent-poem để test
     """
-    def stream_generator():
+    async def stream_generator():
         input_system = [
             {
                 "role": "system",
@@ -228,13 +847,13 @@ def stream_response(request: MessageRequest):
         ]
         input_system.extend(request.input)
         
-        stream = client.chat.completions.create(
+        stream = await get_async_openai().chat.completions.create(
             model="gpt-4.1",
             messages=input_system,
             stream=True,
         )
         
-        for chunk in stream:
+        async for chunk in stream:
             if chunk.choices[0].delta.content is not None:
                 yield json.dumps({"delta": chunk.choices[0].delta.content}) + "\n"
     
@@ -1,21 +1,105 @@
+import asyncio
 import os
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi.responses import StreamingResponse
-from openai import OpenAI
-from typing import List, Dict
+from typing import List, Dict, Optional
 from pydantic import BaseModel
 import json
 
+from chat_sessions import ChatSession, ChatSessionStore
+from llm_clients import close_async_openai, get_async_openai
+from luc_bat import LucBatValidator
+from poem_cache import PoemResponseCache, paced, replay_chunks
+from stream_framing import encode_json_line
+from token_utils import estimate_tokens
+
 class MessageRequest(BaseModel):
-    input: List[Dict[str, str]]
+    # Toàn bộ lịch sử chat (cách cũ), hoặc chỉ tin nhắn mới kèm session_id
+    input: Optional[List[Dict[str, str]]] = None
+    message: Optional[str] = None
+    session_id: Optional[str] = None
+    validate_form: Optional[bool] = None
+    # "full": toàn bộ sự kiện Responses API như trước; "compact": chỉ {"delta": ...} và sự kiện usage cuối cùng
+    stream_format: Optional[str] = None
+    # Dùng lại bài thơ đã lưu cho tin nhắn đầu tiên có cùng chủ đề (mặc định theo env POEM_CACHE)
+    use_cache: Optional[bool] = None
 
 
 app = FastAPI()
-client = OpenAI(
-    api_key=os.environ.get("OPENAI_API_KEY", "")
+
+POEM_MODEL = os.environ.get("POEM_MODEL", "gpt-4.1")
+
+# Kiểm tra luật lục bát trong lúc stream (mặc định tắt, bật qua env hoặc validate_form trong request)
+POEM_VALIDATION = os.environ.get("POEM_VALIDATION", "0") == "1"
+# Số lần tối đa viết lại từ cặp câu hợp lệ cuối cùng khi phát hiện sai luật
+POEM_VALIDATION_MAX_RETRIES = int(os.environ.get("POEM_VALIDATION_MAX_RETRIES", "2"))
+CONTINUE_POEM_INSTRUCTION = (
+    "Câu vừa viết sai luật lục bát ({violation}). Hãy viết tiếp bài thơ ngay sau câu cuối cùng ở trên, "
+    "giữ đúng luật lục bát và cách trình bày, không lặp lại các câu đã viết, chỉ trả về phần thơ viết tiếp."
 )
 
-def event_stream(input: list[dict]):
+# Định dạng stream mặc định khi request không chỉ định stream_format
+POEM_STREAM_FORMAT = os.environ.get("POEM_STREAM_FORMAT", "full")
+STREAM_FORMATS = ("full", "compact")
+
+# Bộ nhớ đệm bài thơ cho tin nhắn đầu tiên (chưa có lịch sử), khóa theo chủ đề đã chuẩn hóa
+POEM_CACHE = os.environ.get("POEM_CACHE", "0") == "1"
+poem_cache = PoemResponseCache()
+
+# Phiên chat lưu ở server: client chỉ gửi tin nhắn mới, lịch sử được giới hạn theo ngân sách token
+chat_sessions = ChatSessionStore()
+
+def encode_delta(event, compact: bool):
+    """
+    Một dòng NDJSON cho sự kiện delta: compact chỉ gửi phần text, full gửi nguyên sự kiện như trước
+    """
+    if compact:
+        return encode_json_line({"delta": event.delta})
+    return json.dumps(event.model_dump()) + "\n"
+
+def first_turn_cache_key(input: List[Dict[str, str]], validate_form: bool) -> Optional[str]:
+    """
+    Khóa bộ nhớ đệm khi request chỉ có đúng một tin nhắn của người dùng, None nếu đã có lịch sử chat
+    """
+    if len(input) != 1 or input[0].get("role") != "user":
+        return None
+    return poem_cache.key(input[0].get("content", ""), POEM_MODEL, validate_form)
+
+async def replay_cached_poem(text: str, validate_form: bool, compact: bool):
+    """
+    Phát lại bài thơ đã lưu qua cùng định dạng stream, từng chữ một theo nhịp POEM_CACHE_REPLAY_DELAY
+    """
+    async for chunk in paced(replay_chunks(text)):
+        if compact:
+            yield encode_json_line({"delta": chunk})
+        else:
+            yield json.dumps({"type": "response.output_text.delta", "delta": chunk}) + "\n"
+    if validate_form:
+        # Chỉ bài thơ đúng luật mới được lưu cho chế độ kiểm tra luật
+        yield json.dumps({"type": "poem.validation", "valid": True, "retries": 0, "wasted_tokens": 0}) + "\n"
+    if compact:
+        yield encode_json_line({"type": "usage", "input_tokens": 0, "output_tokens": 0, "total_tokens": 0, "cached": True})
+
+def add_usage(totals: Dict[str, int], event):
+    """
+    Cộng dồn usage từ sự kiện response.completed (có nhiều lần gọi model khi viết lại thơ)
+    """
+    usage = getattr(getattr(event, "response", None), "usage", None)
+    if event.type == "response.completed" and usage is not None:
+        totals["input_tokens"] += usage.input_tokens
+        totals["output_tokens"] += usage.output_tokens
+        totals["total_tokens"] += usage.total_tokens
+
+def usage_line(totals: Dict[str, int]):
+    return encode_json_line({"type": "usage", **totals})
+
+async def event_stream(
+    input: list[dict],
+    validate_form: bool = False,
+    reply: Optional[Dict[str, str]] = None,
+    compact: bool = False,
+    use_cache: bool = False,
+):
     input_system: List[Dict[str, str]] = [
         {
             "role": "system",
@@ -59,18 +143,172 @@ So bề tài sắc lại là phần hơn.
         }
     ]
     input_system.extend(input)
-    stream = client.responses.create(
-        model="gpt-4.1",
-        input=input_system,
-        stream=True,
-    )
-    for event in stream:
-        if hasattr(event, "delta"):
-            yield json.dumps(event.model_dump()) + "\n"
+    if reply is None:
+        reply = {"text": ""}
+    cache_key = first_turn_cache_key(input, validate_form) if use_cache else None
+    if cache_key:
+        # Tầng đĩa của bộ nhớ đệm là SQLite: chạy trong thread để không chặn event loop
+        cached_poem = await asyncio.to_thread(poem_cache.pick, cache_key)
+        if cached_poem is not None:
+            async for line in replay_cached_poem(cached_poem, validate_form, compact):
+                yield line
+            reply["text"] = cached_poem
+            return
+
+    if validate_form:
+        async for line in validated_event_stream(input_system, reply, compact):
+            yield line
+    else:
+        stream = await get_async_openai().responses.create(
+            model=POEM_MODEL,
+            input=input_system,
+            stream=True,
+        )
+        usage = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+        async for event in stream:
+            if hasattr(event, "delta"):
+                reply["text"] += event.delta
+                yield encode_delta(event, compact)
+            else:
+                add_usage(usage, event)
+        if compact:
+            yield usage_line(usage)
+
+    # Chỉ lưu khi stream hoàn tất (client ngắt giữa chừng thì không tới đây) và thơ đúng luật nếu có kiểm tra
+    if cache_key and reply.get("valid", True):
+        await asyncio.to_thread(poem_cache.add, cache_key, reply["text"])
+
+async def validated_event_stream(
+    input_system: List[Dict[str, str]],
+    reply: Optional[Dict[str, str]] = None,
+    compact: bool = False,
+):
+    """
+    Stream thơ kèm kiểm tra luật lục bát từng câu. Khi một câu sai luật, dừng stream hiện tại,
+    gửi sự kiện poem.rollback (text hợp lệ đến cặp câu cuối cùng) rồi yêu cầu model viết tiếp từ đó.
+    Cuối cùng gửi sự kiện poem.validation với số lần viết lại và số token bị bỏ, rồi sự kiện usage (chỉ ở chế độ compact)
+    (stream bị hủy giữa chừng không trả usage, phần đó chỉ có trong wasted_tokens)
+    """
+    validator = LucBatValidator()
+    messages = input_system
+    retries, wasted_tokens = 0, 0
+    usage = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+    while True:
+        stream = await get_async_openai().responses.create(
+            model=POEM_MODEL,
+            input=messages,
+            stream=True,
+        )
+        violation = None
+        async for event in stream:
+            if hasattr(event, "delta"):
+                yield encode_delta(event, compact)
+                violation = validator.feed(event.delta) or violation
+                if violation and retries < POEM_VALIDATION_MAX_RETRIES:
+                    break
+            else:
+                add_usage(usage, event)
+        else:
+            violation = violation or validator.finish()
+        if reply is not None:
+            reply["text"] = validator.text
+            reply["valid"] = violation is None
+        if not violation or retries >= POEM_VALIDATION_MAX_RETRIES:
+            await stream.close()
+            break
+
+        # Hủy stream upstream để không tốn thêm token cho phần thơ sai luật
+        await stream.close()
+        retries += 1
+        prefix = validator.valid_prefix
+        wasted_tokens += estimate_tokens(validator.text[len(prefix):])
+        yield json.dumps({"type": "poem.rollback", "text": prefix, "reason": violation}, ensure_ascii=False) + "\n"
+
+        validator = LucBatValidator()
+        validator.feed(prefix)
+        messages = input_system
+        if prefix.strip():
+            messages = input_system + [
+                {"role": "assistant", "content": prefix},
+                {"role": "user", "content": CONTINUE_POEM_INSTRUCTION.format(violation=violation)},
+            ]
+
+    yield json.dumps({
+        "type": "poem.validation",
+        "valid": violation is None,
+        "retries": retries,
+        "wasted_tokens": wasted_tokens,
+    }, ensure_ascii=False) + "\n"
+    if compact:
+        yield usage_line(usage)
+
+async def session_event_stream(
+    session: ChatSession,
+    message: str,
+    validate_form: bool,
+    compact: bool = False,
+    use_cache: bool = False,
+):
+    """
+    Stream câu trả lời cho tin nhắn mới dựa trên lịch sử của phiên, lưu lượt chat khi stream hoàn tất
+    """
+    reply = {"text": ""}
+    input_messages = session.history + [{"role": "user", "content": message}]
+    async for line in event_stream(input_messages, validate_form, reply, compact, use_cache):
+        yield line
+    chat_sessions.append_turn(session, message, reply["text"])
+
+@app.on_event("shutdown")
+async def shutdown_llm_client():
+    await close_async_openai()
 
 @app.post("/stream")
 def stream_response(request: MessageRequest):
-    return StreamingResponse(event_stream(request.input), media_type="application/json")
+    validate_form = POEM_VALIDATION if request.validate_form is None else request.validate_form
+    stream_format = request.stream_format or POEM_STREAM_FORMAT
+    if stream_format not in STREAM_FORMATS:
+        raise HTTPException(status_code=400, detail=f"stream_format phải là một trong {', '.join(STREAM_FORMATS)}")
+    compact = stream_format == "compact"
+    media_type = "application/x-ndjson" if compact else "application/json"
+    use_cache = POEM_CACHE if request.use_cache is None else request.use_cache
+    if request.message is not None:
+        # Phiên không tồn tại hoặc đã hết hạn thì tạo phiên mới, ID trả về trong header X-Session-Id
+        session = chat_sessions.get_or_create(request.session_id)
+        return StreamingResponse(
+            session_event_stream(session, request.message, validate_form, compact, use_cache),
+            media_type=media_type,
+            headers={"X-Session-Id": session.session_id, "X-Stream-Format": stream_format}
+        )
+    if request.input is None:
+        raise HTTPException(status_code=400, detail="Thiếu input hoặc message")
+    return StreamingResponse(
+        event_stream(request.input, validate_form, compact=compact, use_cache=use_cache),
+        media_type=media_type,
+        headers={"X-Stream-Format": stream_format}
+    )
+
+@app.get("/poem-cache/stats")
+def get_poem_cache_stats():
+    """
+    Thống kê bộ nhớ đệm bài thơ: hit/miss, số lần phát lại và số bài mới được lưu
+    """
+    return poem_cache.stats()
+
+@app.get("/sessions/{session_id}")
+def get_session(session_id: str):
+    session = chat_sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Phiên chat không tồn tại hoặc đã hết hạn")
+    return {
+        "session_id": session.session_id,
+        "history": session.history,
+        "history_tokens": session.history_tokens(),
+        "dropped_turns": session.dropped_turns,
+    }
+
+@app.delete("/sessions/{session_id}")
+def delete_session(session_id: str):
+    return {"deleted": chat_sessions.delete(session_id)}
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,18 +1,36 @@
 from fastapi import FastAPI, File, UploadFile, Form, HTTPException
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from openai import OpenAI
 from tavily import TavilyClient
-from typing import List, Dict, Optional, Literal
+from typing import Callable, List, Dict, Optional, Literal
 from pydantic import BaseModel
+import asyncio
+import hashlib
 import json
-import PyPDF2
 import io
+import logging
 import os
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
 from dotenv import load_dotenv
 from pptx import Presentation
 
+import pdf_extraction
+from deck_jobs import DeckJobStore
+from llm_clients import close_async_openai, get_async_openai
+from pdf_extraction import PDFExtractionError, PDFTooLargeError
+from search_cache import cached_search, search_cache
+from tiered_cache import TieredCache
+from search_compaction import compact_search_results, format_search_results
+from text_retrieval import select_relevant_chunks
+from token_utils import estimate_tokens
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # --- Pydantic Models ---
 class Slide(BaseModel):
     title: str
@@ -21,6 +39,8 @@ class Slide(BaseModel):
 
 class PresentationRequest(BaseModel):
     outline: List[Slide]
+    max_concurrency: Optional[int] = None
+    batch_size: Optional[int] = None
 
 # --- FastAPI App Initialization ---
 app = FastAPI()
@@ -31,17 +51,87 @@ client = OpenAI(
 )
 tavily_client = TavilyClient(api_key=os.environ.get("TAVILY_API_KEY", ""))
 
+# Upper bound on slides enriched at the same time (search + LLM per slide).
+SLIDE_CONCURRENCY = int(os.environ.get("SLIDE_CONCURRENCY", "5"))
+
+# Long PDFs are chunked and only the top-k chunks relevant to the topic go into the outline prompt.
+PDF_CONTEXT_TOKEN_BUDGET = int(os.environ.get("PDF_CONTEXT_TOKEN_BUDGET", "4000"))
+PDF_CONTEXT_TOP_K = int(os.environ.get("PDF_CONTEXT_TOP_K", "8"))
+PDF_CHUNK_TOKENS = int(os.environ.get("PDF_CHUNK_TOKENS", "300"))
+
+# Slides per batched LLM call (<= 1 disables batching) and the prompt token budget per batch.
+SLIDE_BATCH_SIZE = int(os.environ.get("SLIDE_BATCH_SIZE", "0"))
+SLIDE_BATCH_TOKEN_BUDGET = int(os.environ.get("SLIDE_BATCH_TOKEN_BUDGET", "12000"))
+
+PPTX_MEDIA_TYPE = 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
+
+# Rendered decks stay in memory up to this size (bytes) and spill to a temp file beyond it.
+PPTX_SPILL_THRESHOLD = int(os.environ.get("PPTX_SPILL_THRESHOLD", str(20 * 1024 * 1024)))
+
+# Decks rendered by the streaming endpoint, kept until downloaded via /presentations/{deck_id}.
+MAX_STORED_DECKS = int(os.environ.get("MAX_STORED_DECKS", "20"))
+rendered_decks: "OrderedDict[str, bytes]" = OrderedDict()
+
+# Speculative enrichment started right after /generate-outline (opt-in), keyed by slide fingerprint.
+PREFETCH_SLIDES = os.environ.get("PREFETCH_SLIDES", "false").lower() in ("1", "true", "yes")
+PREFETCH_TTL_SECONDS = float(os.environ.get("PREFETCH_TTL_SECONDS", str(30 * 60)))
+MAX_PREFETCHED_SLIDES = int(os.environ.get("MAX_PREFETCHED_SLIDES", "500"))
+# Enriched content of every slide, keyed by slide fingerprint, so unchanged slides are never recomputed.
+slide_cache = TieredCache(
+    "slides",
+    ttl_seconds=float(os.environ.get("SLIDE_CACHE_TTL", str(7 * 24 * 60 * 60))),
+    max_memory_items=int(os.environ.get("SLIDE_CACHE_MEMORY_ITEMS", "1000")),
+    max_disk_items=int(os.environ.get("SLIDE_CACHE_DISK_ITEMS", "20000")),
+)
+prefetched_slides: "OrderedDict[str, tuple[float, asyncio.Task]]" = OrderedDict()
+prefetch_semaphore: Optional[asyncio.Semaphore] = None
+
+# Background deck jobs: workers started with this process (0 = run them elsewhere with
+# `python agent_pptx_generator.py worker`), poll interval, takeover delay for jobs of dead workers and result TTL.
+DECK_JOB_WORKERS = int(os.environ.get("DECK_JOB_WORKERS", "2"))
+DECK_JOB_POLL_INTERVAL = float(os.environ.get("DECK_JOB_POLL_INTERVAL", "1.0"))
+DECK_JOB_STALE_SECONDS = float(os.environ.get("DECK_JOB_STALE_SECONDS", "300"))
+DECK_JOB_TTL_SECONDS = float(os.environ.get("DECK_JOB_TTL_SECONDS", str(24 * 60 * 60)))
+deck_job_store = DeckJobStore()
+deck_job_tasks: List[asyncio.Task] = []
+
+# Callback used to report pipeline progress: emit(event_name, slide_index, **fields)
+EventCallback = Callable[..., None]
+
+def ignore_event(*args, **kwargs):
+    """Default EventCallback when nobody listens for progress."""
+
+class PipelineReport:
+    """Collects per-request totals from pipeline events; its `record` method is an EventCallback."""
+
+    def __init__(self):
+        self.search_tokens_saved = 0
+        self.recomputed_slides: List[int] = []
+        self.cached_slides: List[int] = []
+
+    def record(self, event: str, slide_index: Optional[int] = None, **fields):
+        self.search_tokens_saved += fields.get("tokens_saved", 0)
+        if event == "llm_finished":
+            reused = fields.get("cached") or fields.get("prefetched")
+            (self.cached_slides if reused else self.recomputed_slides).append(slide_index)
+
+    def headers(self) -> Dict[str, str]:
+        return {
+            "X-Search-Tokens-Saved": str(self.search_tokens_saved),
+            "X-Slides-Recomputed": ",".join(map(str, sorted(self.recomputed_slides))),
+            "X-Slides-Cached": ",".join(map(str, sorted(self.cached_slides))),
+        }
+
 
 # --- Helper Functions ---
-def extract_text_from_pdf(pdf_file: bytes) -> str:
-    """Extracts text from a PDF file."""
+async def extract_text_from_upload(file: UploadFile) -> str:
+    """Reads an upload in chunks and extracts its text in the PDF process pool, off the event loop."""
     try:
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_file))
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-        return text.strip()
-    except Exception as e:
+        pdf_content = await pdf_extraction.read_upload(file)
+        return await pdf_extraction.extract_text_from_pdf_async(pdf_content)
+    except PDFTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except PDFExtractionError as e:
         raise HTTPException(status_code=400, detail=f"Lỗi đọc file PDF: {str(e)}")
 
 def internet_search(
@@ -50,12 +140,13 @@ def internet_search(
     topic: Literal["general", "news", "finance"] = "general",
     include_raw_content: bool = False,
 ):
-    """Run a web search for presentation research"""
+    """Run a web search for presentation research (served from the shared search cache when possible)"""
     if not tavily_client.api_key:
         return {"error": "TAVILY_API_KEY not found in environment variables"}
     
     try:
-        search_docs = tavily_client.search(
+        search_docs = cached_search(
+            tavily_client,
             query,
             max_results=max_results,
             include_raw_content=include_raw_content,
@@ -65,7 +156,7 @@ def internet_search(
     except Exception as e:
         return {"error": f"Lỗi khi tìm kiếm: {str(e)}"}
 
-def create_outline_prompt(topic: str, context: str, search_results: dict) -> str:
+def create_outline_prompt(topic: str, context: str, search_results: List[Dict]) -> str:
     """Creates a prompt for the LLM to generate a presentation outline."""
     return f"""
 Bạn là một chuyên gia tạo nội dung thuyết trình. Nhiệm vụ của bạn là tạo ra một dàn ý chi tiết cho bài thuyết trình dựa trên chủ đề, tài liệu tham khảo và kết quả tìm kiếm trên internet.
@@ -76,7 +167,7 @@ Bạn là một chuyên gia tạo nội dung thuyết trình. Nhiệm vụ của
 {context}
 
 **Kết quả tìm kiếm trên Internet:**
-{json.dumps(search_results, indent=2)}
+{format_search_results(search_results)}
 
 **Yêu cầu:**
 1.  Phân tích chủ đề và các thông tin được cung cấp.
@@ -105,18 +196,19 @@ Bạn là một chuyên gia tạo nội dung thuyết trình. Nhiệm vụ của
 Hãy đảm bảo dàn ý logic, mạch lạc và bao quát được chủ đề.
 """
 
-def create_slide_content_prompt(slide_title: str, outline_points: List[str], search_results: dict) -> str:
+def create_slide_content_prompt(slide_title: str, outline_points: List[str], search_results: List[Dict]) -> str:
     """Creates a prompt for the LLM to generate detailed slide content."""
+    points_text = "\n- ".join(outline_points)
     return f"""
 Bạn là một chuyên gia tạo nội dung thuyết trình. Nhiệm vụ của bạn là viết nội dung chi tiết cho một slide dựa trên tiêu đề, các điểm chính trong dàn ý và kết quả tìm kiếm.
 
 **Tiêu đề Slide:** {slide_title}
 
 **Các điểm chính từ dàn ý:**
-- {"\n- ".join(outline_points)}
+- {points_text}
 
 **Kết quả tìm kiếm trên Internet để tham khảo:**
-{json.dumps(search_results, indent=2)}
+{format_search_results(search_results)}
 
 **Yêu cầu:**
 1.  Dựa vào thông tin trên, hãy viết lại nội dung cho slide một cách chi tiết và hấp dẫn.
@@ -137,9 +229,537 @@ Bạn là một chuyên gia tạo nội dung thuyết trình. Nhiệm vụ của
 ```
 """
 
+BATCH_SLIDE_INSTRUCTIONS = """
+Bạn là một chuyên gia tạo nội dung thuyết trình. Nhiệm vụ của bạn là viết nội dung chi tiết cho nhiều slide cùng lúc. Mỗi slide có chỉ số (`index`), tiêu đề, các điểm chính trong dàn ý và kết quả tìm kiếm riêng.
+
+**Yêu cầu cho từng slide:**
+1.  Dựa vào thông tin của chính slide đó, viết lại nội dung một cách chi tiết và hấp dẫn.
+2.  Giữ lại tiêu đề gốc.
+3.  Mở rộng các điểm chính thành những câu văn hoàn chỉnh, cung cấp thêm thông tin, ví dụ, hoặc số liệu nếu có.
+4.  Trả về kết quả dưới dạng một JSON object có key `slides` là một JSON array, mỗi phần tử ứng với một slide đầu vào và có ba key: `index` (giữ nguyên chỉ số), `title` (giữ nguyên) và `points` (danh sách nội dung chi tiết mới).
+
+**Ví dụ định dạng JSON:**
+```json
+{
+    "slides": [
+        {
+            "index": 0,
+            "title": "Tiêu đề Slide 1",
+            "points": ["Nội dung chi tiết 1.1", "Nội dung chi tiết 1.2"]
+        },
+        {
+            "index": 1,
+            "title": "Tiêu đề Slide 2",
+            "points": ["Nội dung chi tiết 2.1", "Nội dung chi tiết 2.2"]
+        }
+    ]
+}
+```
+"""
+
+def create_batch_slide_section(index: int, slide_title: str, outline_points: List[str], search_results: List[Dict]) -> str:
+    """Formats one slide's input for the batched content prompt."""
+    points_text = "\n- ".join(outline_points)
+    return f"""
+### Slide index {index}
+**Tiêu đề Slide:** {slide_title}
+
+**Các điểm chính từ dàn ý:**
+- {points_text}
+
+**Kết quả tìm kiếm trên Internet để tham khảo:**
+{format_search_results(search_results)}
+"""
+
+def create_batch_slide_content_prompt(sections: List[str]) -> str:
+    """Creates a prompt that asks the LLM to enrich several slides in one call."""
+    return BATCH_SLIDE_INSTRUCTIONS + "\n**Các slide cần viết nội dung:**\n" + "".join(sections)
+
+def split_slide_batches(sections: Dict[int, str], batch_size: int, token_budget: int) -> List[List[int]]:
+    """
+    Groups slide indices into batches of at most `batch_size` slides whose prompt fits
+    `token_budget`. A slide that exceeds the budget on its own gets a batch to itself.
+    """
+    available = token_budget - estimate_tokens(BATCH_SLIDE_INSTRUCTIONS)
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for index, section in sections.items():
+        section_tokens = estimate_tokens(section)
+        if current and (len(current) >= batch_size or current_tokens + section_tokens > available):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += section_tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def parse_batch_slide_content(content: str, expected_indices: List[int]) -> Dict[int, Dict]:
+    """
+    Validates a batched response and returns the well-formed slides by index.
+    Slides that are missing or malformed are left out so the caller can retry them one by one.
+    """
+    try:
+        slides = json.loads(content).get("slides")
+    except (json.JSONDecodeError, AttributeError):
+        return {}
+    if not isinstance(slides, list):
+        return {}
+
+    valid: Dict[int, Dict] = {}
+    for item in slides:
+        if not isinstance(item, dict):
+            continue
+        index, title, points = item.get("index"), item.get("title"), item.get("points")
+        if (
+            index in expected_indices
+            and isinstance(title, str)
+            and isinstance(points, list)
+            and points
+            and all(isinstance(point, str) for point in points)
+        ):
+            valid[index] = {"title": title, "points": points}
+    return valid
+
+def search_for_slide(slide_data: Slide) -> dict:
+    """Searches the web for material to enrich a single slide."""
+    query = f"Detailed information for a presentation slide titled '{slide_data.title}' covering points: {', '.join(slide_data.points)}"
+    search_results = internet_search(query, max_results=3)
+    if "error" in search_results:
+        # Continue without search results if search fails
+        search_results = {}
+    return search_results
+
+def generate_slide_content(slide_data: Slide, search_results: List[Dict]) -> Dict:
+    """Asks the LLM for detailed slide content, falling back to the original outline on failure."""
+    prompt = create_slide_content_prompt(slide_data.title, slide_data.points, search_results)
+    try:
+        response = client.chat.completions.create(
+            model="gpt-4.1",
+            messages=[{"role": "user", "content": prompt}],
+            response_format={"type": "json_object"}
+        )
+        slide_content = json.loads(response.choices[0].message.content)
+        return {
+            "title": slide_content.get("title", slide_data.title),
+            "points": slide_content.get("points", slide_data.points),
+        }
+    except Exception:
+        # If LLM fails, use original content
+        return {"title": slide_data.title, "points": slide_data.points}
+
+def generate_batch_slide_content(batch: List[int], sections: Dict[int, str]) -> Dict[int, Dict]:
+    """Enriches a batch of slides with one LLM call; returns only the slides that passed validation."""
+    prompt = create_batch_slide_content_prompt([sections[index] for index in batch])
+    try:
+        response = client.chat.completions.create(
+            model="gpt-4.1",
+            messages=[{"role": "user", "content": prompt}],
+            response_format={"type": "json_object"}
+        )
+        return parse_batch_slide_content(response.choices[0].message.content, batch)
+    except Exception:
+        return {}
+
+async def search_slide(index: int, slide_data: Slide, emit: EventCallback) -> List[Dict]:
+    """Runs the web search stage for one slide and compacts the results, reporting timing and tokens saved."""
+    emit("search_started", index)
+    stage_start = time.perf_counter()
+    try:
+        raw_results = await asyncio.to_thread(search_for_slide, slide_data)
+    except Exception:
+        raw_results = {}
+    search_results, compaction_stats = compact_search_results(raw_results)
+    emit(
+        "search_finished", index,
+        duration_ms=round((time.perf_counter() - stage_start) * 1000),
+        result_count=len(search_results),
+        **compaction_stats,
+    )
+    return search_results
+
+async def enrich_slide(
+    index: int,
+    slide_data: Slide,
+    semaphore: asyncio.Semaphore,
+    emit: Optional[EventCallback] = None,
+) -> Dict:
+    """Runs search and content generation for one slide in the worker pool."""
+    emit = emit or ignore_event
+    async with semaphore:
+        search_results = await search_slide(index, slide_data, emit)
+
+        stage_start = time.perf_counter()
+        slide_content = await asyncio.to_thread(generate_slide_content, slide_data, search_results)
+        await remember_slide_content(slide_data, slide_content)
+        emit(
+            "llm_finished", index,
+            duration_ms=round((time.perf_counter() - stage_start) * 1000),
+            slide=slide_content,
+        )
+        return slide_content
+
+async def enrich_slides_batched(
+    slides: Dict[int, Slide],
+    semaphore: asyncio.Semaphore,
+    batch_size: int,
+    emit: EventCallback,
+) -> Dict[int, Dict]:
+    """
+    Searches every slide concurrently, then enriches them in token-budgeted batches.
+    Slides a batch fails to return correctly fall back to per-slide calls.
+    """
+    async def bounded_search(index: int, slide_data: Slide) -> List[Dict]:
+        async with semaphore:
+            return await search_slide(index, slide_data, emit)
+
+    search_results = await asyncio.gather(
+        *(bounded_search(index, slide) for index, slide in slides.items())
+    )
+    all_search_results = dict(zip(slides.keys(), search_results))
+    sections = {
+        index: create_batch_slide_section(index, slide.title, slide.points, all_search_results[index])
+        for index, slide in slides.items()
+    }
+    enriched: Dict[int, Dict] = {}
+
+    async def run_batch(batch: List[int]):
+        async with semaphore:
+            stage_start = time.perf_counter()
+            batch_content = await asyncio.to_thread(generate_batch_slide_content, batch, sections)
+            duration_ms = round((time.perf_counter() - stage_start) * 1000)
+        for index, slide_content in batch_content.items():
+            enriched[index] = slide_content
+            await remember_slide_content(slides[index], slide_content)
+            emit("llm_finished", index, duration_ms=duration_ms, slide=slide_content, batched=True)
+
+        async def retry_slide(index: int):
+            async with semaphore:
+                stage_start = time.perf_counter()
+                slide_content = await asyncio.to_thread(
+                    generate_slide_content, slides[index], all_search_results[index]
+                )
+            enriched[index] = slide_content
+            await remember_slide_content(slides[index], slide_content)
+            emit(
+                "llm_finished", index,
+                duration_ms=round((time.perf_counter() - stage_start) * 1000),
+                slide=slide_content,
+                batched=False,
+            )
+
+        await asyncio.gather(*(retry_slide(index) for index in batch if index not in batch_content))
+
+    await asyncio.gather(*(
+        run_batch(batch) for batch in split_slide_batches(sections, batch_size, SLIDE_BATCH_TOKEN_BUDGET)
+    ))
+    return enriched
+
+def outline_slides(outline_json) -> List[Slide]:
+    """Reads the slides out of an LLM outline, which may be a list or wrapped in `slides`/`outline`."""
+    if isinstance(outline_json, dict):
+        outline_json = outline_json.get("slides", outline_json.get("outline", []))
+    slides = []
+    for item in outline_json if isinstance(outline_json, list) else []:
+        try:
+            slides.append(Slide(**item))
+        except Exception:
+            continue
+    return slides
+
+def slide_fingerprint(slide_data: Slide) -> str:
+    """
+    Hash of the slide fields that drive enrichment. `image_suggestion` is left out
+    because it never reaches the content prompt.
+    """
+    key_data = {"title": slide_data.title, "points": slide_data.points}
+    return hashlib.sha256(json.dumps(key_data, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+def is_fallback_content(slide_data: Slide, slide_content: Dict) -> bool:
+    """True when enrichment failed and the original outline came back."""
+    return slide_content == {"title": slide_data.title, "points": slide_data.points}
+
+async def remember_slide_content(slide_data: Slide, slide_content: Dict):
+    """Caches enriched content for a slide, unless it is only the fallback outline."""
+    if not is_fallback_content(slide_data, slide_content):
+        await asyncio.to_thread(slide_cache.set, slide_fingerprint(slide_data), slide_content)
+
+def prefetch_slides(slides: List[Slide]):
+    """
+    Starts enriching outline slides in the background so a later /generate-presentation
+    for the same (unedited) slides can reuse the work.
+    """
+    global prefetch_semaphore
+    if prefetch_semaphore is None:
+        prefetch_semaphore = asyncio.Semaphore(max(1, SLIDE_CONCURRENCY))
+
+    now = time.time()
+    for fingerprint, (started_at, _) in list(prefetched_slides.items()):
+        if now - started_at > PREFETCH_TTL_SECONDS:
+            del prefetched_slides[fingerprint]
+
+    for index, slide in enumerate(slides):
+        fingerprint = slide_fingerprint(slide)
+        if fingerprint in prefetched_slides:
+            continue
+        task = asyncio.create_task(enrich_slide(index, slide, prefetch_semaphore))
+        prefetched_slides[fingerprint] = (now, task)
+        while len(prefetched_slides) > MAX_PREFETCHED_SLIDES:
+            _, (_, oldest_task) = prefetched_slides.popitem(last=False)
+            oldest_task.cancel()
+
+def find_prefetched_slide(slide_data: Slide) -> Optional[asyncio.Task]:
+    """Returns the (possibly still running) prefetch task for an unchanged slide."""
+    entry = prefetched_slides.get(slide_fingerprint(slide_data))
+    if entry is None or time.time() - entry[0] > PREFETCH_TTL_SECONDS:
+        return None
+    return entry[1]
+
+async def enrich_slides(
+    slides: List[Slide],
+    concurrency: int = SLIDE_CONCURRENCY,
+    emit: Optional[EventCallback] = None,
+    batch_size: int = SLIDE_BATCH_SIZE,
+) -> List[Dict]:
+    """
+    Enriches all slides concurrently, keeping the outline order. Slides whose fingerprint is
+    cached or prefetched are reused; only new or edited slides are searched and enriched.
+    """
+    emit = emit or ignore_event
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    enriched: Dict[int, Dict] = {}
+
+    prefetched: Dict[int, asyncio.Task] = {}
+    pending: Dict[int, Slide] = {}
+    cached_contents = await asyncio.gather(
+        *(asyncio.to_thread(slide_cache.get, slide_fingerprint(slide)) for slide in slides)
+    )
+    for index, (slide, cached_content) in enumerate(zip(slides, cached_contents)):
+        if cached_content is not None:
+            enriched[index] = cached_content
+            emit("llm_finished", index, duration_ms=0, slide=cached_content, cached=True)
+            continue
+        task = find_prefetched_slide(slide)
+        if task is not None:
+            prefetched[index] = task
+        else:
+            pending[index] = slide
+
+    async def reuse_prefetched(index: int, task: asyncio.Task):
+        stage_start = time.perf_counter()
+        try:
+            slide_content = await asyncio.shield(task)
+        except (asyncio.CancelledError, Exception):
+            slide_content = None
+        # Compute a failed prefetch again rather than reuse the fallback outline
+        if slide_content is None or is_fallback_content(slides[index], slide_content):
+            enriched[index] = await enrich_slide(index, slides[index], semaphore, emit)
+            return
+        enriched[index] = slide_content
+        emit(
+            "llm_finished", index,
+            duration_ms=round((time.perf_counter() - stage_start) * 1000),
+            slide=slide_content,
+            prefetched=True,
+        )
+
+    async def enrich_pending():
+        if batch_size > 1 and len(pending) > 1:
+            enriched.update(await enrich_slides_batched(pending, semaphore, batch_size, emit))
+        else:
+            results = await asyncio.gather(
+                *(enrich_slide(index, slide, semaphore, emit) for index, slide in pending.items())
+            )
+            enriched.update(zip(pending.keys(), results))
+
+    await asyncio.gather(enrich_pending(), *(reuse_prefetched(index, task) for index, task in prefetched.items()))
+    return [enriched[index] for index in range(len(slides))]
+
+def build_presentation(slides: List[Dict]) -> Presentation:
+    """Builds a Presentation with one Title and Content slide per enriched slide."""
+    prs = Presentation()
+    for slide_content in slides:
+        slide_layout = prs.slide_layouts[1]  # Title and Content layout
+        slide = prs.slides.add_slide(slide_layout)
+        title_shape = slide.shapes.title
+        content_shape = slide.placeholders[1]
+        
+        title_shape.text = slide_content["title"]
+        
+        tf = content_shape.text_frame
+        tf.clear() 
+        
+        for point in slide_content["points"]:
+            p = tf.add_paragraph()
+            p.text = point
+            p.level = 1
+    return prs
+
+def render_presentation(slides: List[Dict]) -> tempfile.SpooledTemporaryFile:
+    """
+    Renders enriched slides into a per-request buffer, rewound and ready to read.
+    The buffer lives in memory and only spills to disk above PPTX_SPILL_THRESHOLD.
+    """
+    buffer = tempfile.SpooledTemporaryFile(max_size=PPTX_SPILL_THRESHOLD)
+    build_presentation(slides).save(buffer)
+    buffer.seek(0)
+    return buffer
+
+def render_presentation_bytes(slides: List[Dict]) -> bytes:
+    """Renders enriched slides to PPTX bytes."""
+    with render_presentation(slides) as buffer:
+        return buffer.read()
+
+def iter_buffer(buffer, chunk_size: int = 64 * 1024):
+    """Streams a rendered deck in chunks and releases the buffer afterwards."""
+    try:
+        while chunk := buffer.read(chunk_size):
+            yield chunk
+    finally:
+        buffer.close()
+
+def store_rendered_deck(deck: bytes) -> str:
+    """Keeps a rendered deck for later download, evicting the oldest beyond MAX_STORED_DECKS."""
+    deck_id = uuid.uuid4().hex
+    rendered_decks[deck_id] = deck
+    while len(rendered_decks) > MAX_STORED_DECKS:
+        rendered_decks.popitem(last=False)
+    return deck_id
+
+async def presentation_event_stream(slides: List[Slide], concurrency: int, batch_size: int = SLIDE_BATCH_SIZE):
+    """
+    Yields NDJSON progress events while the deck is built, then a final `done` event
+    carrying the download URL of the rendered deck.
+    """
+    started = time.perf_counter()
+    queue: asyncio.Queue = asyncio.Queue()
+    report = PipelineReport()
+
+    def emit(event: str, slide_index: Optional[int] = None, **fields):
+        report.record(event, slide_index, **fields)
+        payload = {"event": event, "elapsed_ms": round((time.perf_counter() - started) * 1000)}
+        if slide_index is not None:
+            payload["slide_index"] = slide_index
+        payload.update(fields)
+        queue.put_nowait(payload)
+
+    async def run_pipeline():
+        try:
+            return await enrich_slides(slides, concurrency, emit, batch_size)
+        finally:
+            queue.put_nowait(None)
+
+    emit("started", slide_count=len(slides), concurrency=concurrency, batch_size=batch_size)
+    pipeline = asyncio.create_task(run_pipeline())
+    try:
+        while (event := await queue.get()) is not None:
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+        enriched_slides = await pipeline
+        render_start = time.perf_counter()
+        deck = await asyncio.to_thread(render_presentation_bytes, enriched_slides)
+        deck_id = store_rendered_deck(deck)
+        emit(
+            "done",
+            deck_id=deck_id,
+            download_url=f"/presentations/{deck_id}",
+            render_ms=round((time.perf_counter() - render_start) * 1000),
+            size_bytes=len(deck),
+            search_tokens_saved=report.search_tokens_saved,
+            recomputed_slides=sorted(report.recomputed_slides),
+            cached_slides=sorted(report.cached_slides),
+        )
+        yield json.dumps(queue.get_nowait(), ensure_ascii=False) + "\n"
+    finally:
+        # Stop outstanding slide work if the client disconnects mid-stream
+        if not pipeline.done():
+            pipeline.cancel()
+
+def write_presentation_file(slides: List[Dict], path: str):
+    """Renders a deck straight to `path`, replacing it atomically."""
+    tmp_path = f"{path}.tmp"
+    build_presentation(slides).save(tmp_path)
+    os.replace(tmp_path, path)
+
+async def run_deck_job(job: Dict):
+    """Generates the deck for one claimed job, recording per-slide progress in the job store."""
+    job_id = job["id"]
+    loop = asyncio.get_running_loop()
+    progress_writes: List[asyncio.Future] = []
+
+    def record_progress(event: str, slide_index: Optional[int] = None, **fields):
+        if slide_index is not None:
+            progress_writes.append(
+                loop.run_in_executor(None, deck_job_store.record_progress, job_id, slide_index, event)
+            )
+
+    try:
+        request = PresentationRequest(**job["request"])
+        concurrency = min(request.max_concurrency or SLIDE_CONCURRENCY, SLIDE_CONCURRENCY)
+        batch_size = request.batch_size if request.batch_size is not None else SLIDE_BATCH_SIZE
+        enriched_slides = await enrich_slides(request.outline, concurrency, record_progress, batch_size)
+        result_path = deck_job_store.result_path_for(job_id)
+        await asyncio.to_thread(write_presentation_file, enriched_slides, result_path)
+        await asyncio.to_thread(deck_job_store.complete, job_id, result_path)
+    except Exception as e:
+        await asyncio.to_thread(deck_job_store.fail, job_id, str(e))
+    finally:
+        # Progress is best effort, but failed writes are reported instead of left unretrieved
+        for result in await asyncio.gather(*progress_writes, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.warning("Deck job %s: progress write failed: %s", job_id, result)
+
+async def deck_job_worker(worker_id: str):
+    """Claims and runs queued deck jobs until cancelled; errors are logged and the worker keeps polling."""
+    last_purge = 0.0
+    while True:
+        try:
+            if time.time() - last_purge > 60:
+                await asyncio.to_thread(deck_job_store.purge_expired, DECK_JOB_TTL_SECONDS)
+                last_purge = time.time()
+
+            job = await asyncio.to_thread(deck_job_store.claim_next, worker_id, DECK_JOB_STALE_SECONDS)
+            if job is None:
+                await asyncio.sleep(DECK_JOB_POLL_INTERVAL)
+                continue
+            await run_deck_job(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # e.g. a transient "database is locked"; back off instead of letting the worker task die
+            logger.exception("Deck job worker %s failed, retrying", worker_id)
+            await asyncio.sleep(DECK_JOB_POLL_INTERVAL)
+
+def start_deck_job_workers(count: int) -> List[asyncio.Task]:
+    prefix = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    return [asyncio.create_task(deck_job_worker(f"{prefix}-{i}")) for i in range(count)]
+
+def deck_job_status(job: Dict) -> Dict:
+    """Public view of a job for the status endpoint."""
+    progress = job["progress"]
+    status = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "slide_count": len(progress),
+        "slides_done": sum(1 for stage in progress if stage == "llm_finished"),
+        "slides": [{"slide_index": i, "stage": stage} for i, stage in enumerate(progress)],
+        "created_at": job["created_at"],
+        "finished_at": job["finished_at"],
+        "error": job["error"],
+    }
+    if job["status"] == "done":
+        status["download_url"] = f"/presentation-jobs/{job['id']}/download"
+    return status
+
 # --- API Endpoints ---
 @app.post("/generate-outline")
-async def generate_outline(topic: str = Form(...), file: Optional[UploadFile] = File(None)):
+async def generate_outline(
+    response: Response,
+    topic: str = Form(...),
+    file: Optional[UploadFile] = File(None),
+    prefetch: Optional[bool] = Form(None),
+):
     """
     Generates a presentation outline from a topic, optional PDF, and internet search.
     """
@@ -149,87 +769,166 @@ async def generate_outline(topic: str = Form(...), file: Optional[UploadFile] =
         if not file.filename.lower().endswith('.pdf'):
             raise HTTPException(status_code=400, detail="Chỉ chấp nhận file PDF")
         try:
-            pdf_content = await file.read()
-            pdf_context = extract_text_from_pdf(pdf_content)
+            pdf_context = await extract_text_from_upload(file)
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Lỗi xử lý file: {str(e)}")
 
-    # 2. Perform internet search
-    search_results = internet_search(query=f"Outline for presentation on {topic}")
+        # Keep only the parts of long documents that are relevant to the topic
+        pdf_context = await asyncio.to_thread(
+            select_relevant_chunks,
+            pdf_context,
+            topic,
+            top_k=PDF_CONTEXT_TOP_K,
+            token_budget=PDF_CONTEXT_TOKEN_BUDGET,
+            chunk_tokens=PDF_CHUNK_TOKENS,
+        )
+
+    # 2. Perform internet search (the Tavily client is sync, so it runs off the event loop)
+    search_results = await asyncio.to_thread(internet_search, query=f"Outline for presentation on {topic}")
     if "error" in search_results:
         raise HTTPException(status_code=500, detail=search_results["error"])
+    search_results, compaction_stats = compact_search_results(search_results)
+    response.headers["X-Search-Tokens-Saved"] = str(compaction_stats["tokens_saved"])
 
     # 3. Generate outline using LLM
     prompt = create_outline_prompt(topic, pdf_context, search_results)
     try:
-        response = client.chat.completions.create(
+        completion = await get_async_openai().chat.completions.create(
             model="gpt-4.1",
             messages=[{"role": "user", "content": prompt}],
             response_format={"type": "json_object"}
         )
-        outline_json = json.loads(response.choices[0].message.content)
-        return outline_json
+        outline_json = json.loads(completion.choices[0].message.content)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lỗi khi gọi LLM để tạo dàn ý: {str(e)}")
 
+    # 4. Optionally start enriching the slides before the user accepts the outline
+    if prefetch is None:
+        prefetch = PREFETCH_SLIDES
+    if prefetch:
+        slides = outline_slides(outline_json)
+        prefetch_slides(slides)
+        response.headers["X-Prefetched-Slides"] = str(len(slides))
+    return outline_json
+
 
 @app.post("/generate-presentation")
 async def generate_presentation(request: PresentationRequest):
     """
     Generates a PPTX file from a given outline, enriching each slide with search results.
     """
-    prs = Presentation()
-    
-    for slide_data in request.outline:
-        # 1. Search for detailed content for the current slide
-        query = f"Detailed information for a presentation slide titled '{slide_data.title}' covering points: {', '.join(slide_data.points)}"
-        search_results = internet_search(query, max_results=3)
-        if "error" in search_results:
-            # Continue without search results if search fails
-            search_results = {}
-
-        # 2. Generate detailed slide content using LLM
-        prompt = create_slide_content_prompt(slide_data.title, slide_data.points, search_results)
-        try:
-            response = client.chat.completions.create(
-                model="gpt-4.1",
-                messages=[{"role": "user", "content": prompt}],
-                response_format={"type": "json_object"}
-            )
-            slide_content = json.loads(response.choices[0].message.content)
-            final_title = slide_content.get("title", slide_data.title)
-            final_points = slide_content.get("points", slide_data.points)
-        except Exception:
-            # If LLM fails, use original content
-            final_title = slide_data.title
-            final_points = slide_data.points
+    # Clients may lower the limit, but never raise it above the server default
+    concurrency = min(request.max_concurrency or SLIDE_CONCURRENCY, SLIDE_CONCURRENCY)
+    batch_size = request.batch_size if request.batch_size is not None else SLIDE_BATCH_SIZE
+    report = PipelineReport()
+    enriched_slides = await enrich_slides(request.outline, concurrency, report.record, batch_size)
 
-        # 3. Add the enriched content to the presentation slide
-        slide_layout = prs.slide_layouts[1]  # Title and Content layout
-        slide = prs.slides.add_slide(slide_layout)
-        title_shape = slide.shapes.title
-        content_shape = slide.placeholders[1]
-        
-        title_shape.text = final_title
-        
-        tf = content_shape.text_frame
-        tf.clear() 
-        
-        for point in final_points:
-            p = tf.add_paragraph()
-            p.text = point
-            p.level = 1
+    buffer = await asyncio.to_thread(render_presentation, enriched_slides)
+    size = buffer.seek(0, io.SEEK_END)
+    buffer.seek(0)
 
-    output_path = "generated_presentation.pptx"
-    prs.save(output_path)
-    
-    return FileResponse(
-        output_path, 
-        media_type='application/vnd.openxmlformats-officedocument.presentationml.presentation', 
-        filename='presentation.pptx'
+    return StreamingResponse(
+        iter_buffer(buffer),
+        media_type=PPTX_MEDIA_TYPE,
+        headers={
+            "Content-Disposition": 'attachment; filename="presentation.pptx"',
+            "Content-Length": str(size),
+            **report.headers(),
+        }
+    )
+
+@app.post("/generate-presentation/stream")
+async def generate_presentation_stream(request: PresentationRequest):
+    """
+    Streams per-slide progress events (NDJSON) while the deck is generated.
+    The final `done` event contains a download URL for the PPTX.
+    """
+    concurrency = min(request.max_concurrency or SLIDE_CONCURRENCY, SLIDE_CONCURRENCY)
+    batch_size = request.batch_size if request.batch_size is not None else SLIDE_BATCH_SIZE
+    return StreamingResponse(
+        presentation_event_stream(request.outline, concurrency, batch_size),
+        media_type="application/json"
+    )
+
+@app.get("/presentations/{deck_id}")
+async def download_presentation(deck_id: str):
+    """
+    Downloads a deck produced by /generate-presentation/stream.
+    """
+    deck = rendered_decks.get(deck_id)
+    if deck is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy bài trình bày hoặc đã hết hạn")
+    return Response(
+        content=deck,
+        media_type=PPTX_MEDIA_TYPE,
+        headers={"Content-Disposition": 'attachment; filename="presentation.pptx"'}
     )
 
+@app.on_event("startup")
+async def start_background_workers():
+    deck_job_tasks.extend(start_deck_job_workers(DECK_JOB_WORKERS))
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    # Interrupted jobs stay "running" in the store and are taken over once they go stale
+    for task in deck_job_tasks:
+        task.cancel()
+    deck_job_tasks.clear()
+    pdf_extraction.shutdown_process_pool()
+    await close_async_openai()
+
+@app.post("/presentation-jobs", status_code=202)
+async def submit_presentation_job(request: PresentationRequest):
+    """
+    Queues deck generation in the background and returns a job ID to poll.
+    """
+    job_id = await asyncio.to_thread(deck_job_store.create, request.model_dump(), len(request.outline))
+    return {
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/presentation-jobs/{job_id}",
+    }
+
+@app.get("/presentation-jobs/{job_id}")
+async def get_presentation_job(job_id: str):
+    """
+    Returns the status and per-slide progress of a deck job.
+    """
+    job = await asyncio.to_thread(deck_job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy công việc hoặc đã hết hạn")
+    return deck_job_status(job)
+
+@app.get("/presentation-jobs/{job_id}/download")
+async def download_presentation_job(job_id: str):
+    """
+    Downloads the deck of a finished job.
+    """
+    job = await asyncio.to_thread(deck_job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy công việc hoặc đã hết hạn")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Công việc chưa hoàn thành (trạng thái: {job['status']})")
+    return FileResponse(job["result_path"], media_type=PPTX_MEDIA_TYPE, filename="presentation.pptx")
+
+@app.get("/search-cache/stats")
+def get_search_cache_stats():
+    """
+    Returns hit/miss counters and sizes of the shared search cache.
+    """
+    return search_cache.stats()
+
 # --- Main Execution ---
+async def run_standalone_workers(count: int):
+    await asyncio.gather(*start_deck_job_workers(count))
+
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run("agent_pptx_generator:app", host="0.0.0.0", port=8002, reload=True)
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == "worker":
+        # Job workers only, scaled independently from the API (run the API with DECK_JOB_WORKERS=0)
+        asyncio.run(run_standalone_workers(max(1, DECK_JOB_WORKERS)))
+    else:
+        import uvicorn
+        uvicorn.run("agent_pptx_generator:app", host="0.0.0.0", port=8002, reload=True)
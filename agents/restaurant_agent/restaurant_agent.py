@@ -1,6 +1,5 @@
 import os
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_tavily import TavilySearch
 
 # Tải các biến môi trường từ tệp .env
 from dotenv import load_dotenv
@@ -17,6 +16,7 @@ from .tools.menu_tools import (
 )
 from .tools.vision_tools import extract_food_info_from_image
 from .tools.generative_tools import generate_image, generate_video
+from .tools.search_tools import web_search
 
 # --- Thiết lập Agent ---
 
@@ -32,8 +32,8 @@ if "GEMINI_API_KEY" not in os.environ:
 model = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0, api_key=os.environ["GEMINI_API_KEY"])
 
 # 3. Khởi tạo các công cụ
-# Công cụ tìm kiếm web
-search = TavilySearch(max_results=2)
+# Công cụ tìm kiếm web (dùng chung bộ nhớ đệm tìm kiếm với các agent khác)
+search = web_search
 
 # Tập hợp tất cả các công cụ lại
 tools = [
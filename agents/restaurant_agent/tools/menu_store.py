@@ -0,0 +1,150 @@
+"""
+SQLite storage for the restaurant menu. Dish names are unique regardless of
+case through an index on their case-folded form, so lookups, edits and deletes
+touch one row instead of parsing and rewriting the whole menu. Every write runs
+in its own transaction (BEGIN IMMEDIATE), so several workers can edit the menu
+at once without losing updates. On first use an existing menu.json is imported.
+"""
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+MENU_DB_PATH = os.environ.get("MENU_DB_PATH", "agents/restaurant_agent/menu.sqlite3")
+
+
+def name_key(name: str) -> str:
+    """Case-insensitive form of a dish name used by the unique index."""
+    return " ".join(name.split()).casefold()
+
+
+class MenuStore:
+    """Menu items in SQLite with a unique case-insensitive name index and atomic updates."""
+
+    def __init__(self, db_path: str = MENU_DB_PATH, legacy_json_path: Optional[str] = None):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+        finally:
+            conn.close()
+        with self._connect(immediate=True) as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS menu_items (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    name_key TEXT NOT NULL,
+                    description TEXT NOT NULL DEFAULT '',
+                    price REAL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_menu_items_name ON menu_items (name_key)")
+            conn.execute("CREATE TABLE IF NOT EXISTS menu_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            if legacy_json_path:
+                self._migrate_json(conn, legacy_json_path)
+
+    @contextmanager
+    def _connect(self, immediate: bool = False) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            # BEGIN IMMEDIATE takes the write lock up front so read-modify-write is atomic across processes
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def _migrate_json(self, conn: sqlite3.Connection, json_path: str):
+        """Imports the old menu.json once; later deletes never bring its items back."""
+        if conn.execute("SELECT 1 FROM menu_meta WHERE key = 'migrated_from'").fetchone():
+            return
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                items = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            items = []
+        self._insert_many(conn, items)
+        conn.execute(
+            "INSERT INTO menu_meta (key, value) VALUES ('migrated_from', ?)",
+            (json.dumps({"path": json_path, "items": len(items), "at": time.time()}),),
+        )
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        return {"name": row["name"], "description": row["description"], "price": row["price"]}
+
+    @staticmethod
+    def _insert_many(conn: sqlite3.Connection, items: List[Dict[str, Any]]) -> Tuple[List[str], List[str]]:
+        added, duplicates = [], []
+        now = time.time()
+        for item in items:
+            cursor = conn.execute(
+                """
+                INSERT INTO menu_items (name, name_key, description, price, updated_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (name_key) DO NOTHING
+                """,
+                (item["name"], name_key(item["name"]), item.get("description") or "", item.get("price"), now),
+            )
+            (added if cursor.rowcount else duplicates).append(item["name"])
+        return added, duplicates
+
+    def list_items(self) -> List[Dict[str, Any]]:
+        """Every item in insertion order."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT name, description, price FROM menu_items ORDER BY id").fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT name, description, price FROM menu_items WHERE name_key = ?", (name_key(name),)
+            ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def add(self, name: str, description: str, price: Optional[float]) -> bool:
+        """Adds a dish; returns False if one with the same name (any case) exists."""
+        added, _ = self.add_many([{"name": name, "description": description, "price": price}])
+        return bool(added)
+
+    def add_many(self, items: List[Dict[str, Any]]) -> Tuple[List[str], List[str]]:
+        """Adds dishes in one transaction; returns the added names and the names that already existed."""
+        with self._connect(immediate=True) as conn:
+            return self._insert_many(conn, items)
+
+    def update(self, name: str, description: Optional[str] = None, price: Optional[float] = None) -> bool:
+        """Updates the given fields of a dish; returns False if it does not exist."""
+        with self._connect(immediate=True) as conn:
+            cursor = conn.execute(
+                """
+                UPDATE menu_items
+                SET description = COALESCE(?, description), price = COALESCE(?, price), updated_at = ?
+                WHERE name_key = ?
+                """,
+                (description, price, time.time(), name_key(name)),
+            )
+            return cursor.rowcount > 0
+
+    def delete(self, name: str) -> bool:
+        with self._connect(immediate=True) as conn:
+            return conn.execute("DELETE FROM menu_items WHERE name_key = ?", (name_key(name),)).rowcount > 0
+
+    def replace_all(self, items: List[Dict[str, Any]]):
+        """Replaces the whole menu atomically (later duplicates of a name are dropped)."""
+        with self._connect(immediate=True) as conn:
+            conn.execute("DELETE FROM menu_items")
+            self._insert_many(conn, items)
+
+    def count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM menu_items").fetchone()[0]
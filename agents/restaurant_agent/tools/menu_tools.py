@@ -3,8 +3,14 @@ from langchain_core.tools import tool
 from typing import List, Dict, Any
 from pydantic import BaseModel, Field
 
+from .menu_store import MenuStore
+
+# File JSON cũ, chỉ dùng để chuyển dữ liệu sang SQLite ở lần chạy đầu tiên
 MENU_FILE = "agents/restaurant_agent/menu.json"
 
+# Thực đơn lưu trong SQLite: tên món duy nhất không phân biệt hoa thường, mỗi thao tác là một transaction
+menu_store = MenuStore(legacy_json_path=MENU_FILE)
+
 class AddDishInput(BaseModel):
     """Input schema cho tool thêm món ăn"""
     name: str = Field(description="Tên món ăn")
@@ -53,17 +59,12 @@ def _connect_firestore():
         return None
 
 def load_menu() -> List[Dict[str, Any]]:
-    """Tải thực đơn từ file JSON."""
-    try:
-        with open(MENU_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return []
+    """Tải toàn bộ thực đơn từ SQLite."""
+    return menu_store.list_items()
 
 def save_menu(menu: List[Dict[str, Any]]):
-    """Lưu thực đơn vào file JSON."""
-    with open(MENU_FILE, 'w', encoding='utf-8') as f:
-        json.dump(menu, f, indent=4, ensure_ascii=False)
+    """Thay toàn bộ thực đơn trong SQLite (trong một transaction)."""
+    menu_store.replace_all(menu)
 
 @tool
 def read_menu() -> str:
@@ -87,13 +88,10 @@ def add_menu_item(name: str, description: str, price: float, image_base64: str)
         price: Giá của món ăn.
         image_base64: Ảnh của món ăn.
     """
-    menu = load_menu()
     # Kiểm tra xem món ăn đã tồn tại chưa
-    if any(item['name'].lower() == name.lower() for item in menu):
+    if menu_store.get(name) is not None:
         return f"Lỗi: Món ăn '{name}' đã tồn tại trong thực đơn."
     
-    menu.append({"name": name, "description": description, "price": price})
-    
     # Kết nối Firestore
     db = _connect_firestore()
     if not db:
@@ -123,21 +121,9 @@ def edit_menu_item(name: str, new_description: str = None, new_price: float = No
         new_description: Mô tả mới cho món ăn (tùy chọn).
         new_price: Giá mới cho món ăn (tùy chọn).
     """
-    menu = load_menu()
-    item_found = False
-    for item in menu:
-        if item['name'].lower() == name.lower():
-            if new_description is not None:
-                item['description'] = new_description
-            if new_price is not None:
-                item['price'] = new_price
-            item_found = True
-            break
-            
-    if not item_found:
+    if not menu_store.update(name, new_description, new_price):
         return f"Lỗi: Không tìm thấy món ăn '{name}' trong thực đơn."
         
-    save_menu(menu)
     return f"Đã cập nhật thành công thông tin cho món '{name}'."
 
 @tool
@@ -148,14 +134,9 @@ def delete_menu_item(name: str) -> str:
     Args:
         name: Tên của món ăn cần xóa.
     """
-    menu = load_menu()
-    original_length = len(menu)
-    new_menu = [item for item in menu if item['name'].lower() != name.lower()]
-    
-    if len(new_menu) == original_length:
+    if not menu_store.delete(name):
         return f"Lỗi: Không tìm thấy món ăn '{name}' để xóa."
         
-    save_menu(new_menu)
     return f"Đã xóa thành công món '{name}' khỏi thực đơn."
 
 @tool
@@ -167,10 +148,8 @@ def add_multiple_menu_items(items: List[Dict[str, Any]]) -> str:
         items: Một danh sách các món ăn. Mỗi món ăn phải là một dictionary
                chứa 'name' (tên), 'description' (mô tả), và 'price' (giá).
     """
-    menu = load_menu()
-    added_count = 0
+    new_items = []
     skipped_items = []
-    added_items_names = []
 
     for item in items:
         name = item.get('name')
@@ -181,17 +160,12 @@ def add_multiple_menu_items(items: List[Dict[str, Any]]) -> str:
             skipped_items.append(name or "Món ăn không tên (thiếu thông tin)")
             continue
 
-        # Kiểm tra xem món ăn đã tồn tại chưa
-        if any(existing_item['name'].lower() == name.lower() for existing_item in menu):
-            skipped_items.append(f"{name} (đã tồn tại)")
-            continue
-        
-        menu.append({"name": name, "description": description, "price": price})
-        added_count += 1
-        added_items_names.append(name)
+        new_items.append({"name": name, "description": description, "price": price})
 
-    if added_count > 0:
-        save_menu(menu)
+    # Thêm tất cả trong một transaction; món đã tồn tại (không phân biệt hoa thường) bị bỏ qua
+    added_items_names, existing_names = menu_store.add_many(new_items)
+    skipped_items.extend(f"{name} (đã tồn tại)" for name in existing_names)
+    added_count = len(added_items_names)
 
     # Tạo thông điệp phản hồi
     if added_count == 0:
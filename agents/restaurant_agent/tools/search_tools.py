@@ -0,0 +1,27 @@
+import json
+import os
+from langchain_core.tools import tool
+from tavily import TavilyClient
+
+# Tải các biến môi trường từ tệp .env
+from dotenv import load_dotenv
+load_dotenv()
+
+# Dùng chung bộ nhớ đệm tìm kiếm với các agent khác
+from search_cache import cached_search
+
+tavily_client = TavilyClient(api_key=os.environ.get("TAVILY_API_KEY", ""))
+
+@tool
+def web_search(query: str) -> str:
+    """
+    Tìm kiếm thông tin trên internet (món ăn, nguyên liệu, giá cả, xu hướng ẩm thực...).
+    Kết quả được lưu đệm nên các truy vấn lặp lại sẽ trả về ngay lập tức.
+    Args:
+        query: Nội dung cần tìm kiếm.
+    """
+    try:
+        results = cached_search(tavily_client, query, max_results=2)
+        return json.dumps(results, ensure_ascii=False)
+    except Exception as e:
+        return f"Đã xảy ra lỗi khi tìm kiếm: {e}"
@@ -0,0 +1,162 @@
+"""
+Benchmark of the restaurant menu storage: the previous whole-file menu.json
+handling (load, linear case-insensitive scan, rewrite with indent=4) against the
+SQLite MenuStore, on a menu with many items.
+
+    python benchmarks/menu_store_benchmark.py --items 10000 --operations 200 --workers 4
+
+Measures the average latency of lookup/edit/delete/add tool operations, then has
+several processes add dishes concurrently to count lost writes. Uses temporary
+files only.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from agents.restaurant_agent.tools.menu_store import MenuStore  # noqa: E402
+
+
+class JsonMenu:
+    """The previous menu_tools.py storage: every operation parses and rewrites menu.json."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return []
+
+    def save(self, menu):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(menu, f, indent=4, ensure_ascii=False)
+
+    def get(self, name):
+        return next((item for item in self.load() if item["name"].lower() == name.lower()), None)
+
+    def add(self, name, description, price):
+        menu = self.load()
+        if any(item["name"].lower() == name.lower() for item in menu):
+            return False
+        menu.append({"name": name, "description": description, "price": price})
+        self.save(menu)
+        return True
+
+    def update(self, name, description=None, price=None):
+        menu = self.load()
+        for item in menu:
+            if item["name"].lower() == name.lower():
+                if description is not None:
+                    item["description"] = description
+                if price is not None:
+                    item["price"] = price
+                self.save(menu)
+                return True
+        return False
+
+    def delete(self, name):
+        menu = self.load()
+        new_menu = [item for item in menu if item["name"].lower() != name.lower()]
+        if len(new_menu) == len(menu):
+            return False
+        self.save(new_menu)
+        return True
+
+
+def make_items(count: int):
+    return [
+        {
+            "name": f"Món số {index} đặc biệt",
+            "description": "Bún chả Hà Nội gồm bún, chả thịt lợn nướng, ăn kèm nước mắm chua cay mặn ngọt.",
+            "price": 35000.0 + index,
+        }
+        for index in range(count)
+    ]
+
+
+def open_backend(kind: str, path: str):
+    return JsonMenu(path) if kind == "json" else MenuStore(path)
+
+
+def time_operations(backend, items, operations: int):
+    rng = random.Random(0)
+    names = [item["name"] for item in items]
+    timings = {}
+
+    def timed(label, fn):
+        started = time.perf_counter()
+        for index in range(operations):
+            fn(index)
+        timings[label] = (time.perf_counter() - started) / operations * 1000
+
+    timed("lookup", lambda i: backend.get(rng.choice(names).upper()))
+    timed("edit", lambda i: backend.update(rng.choice(names).upper(), price=50000.0 + i))
+    timed("add", lambda i: backend.add(f"Món mới {i}", "Món thêm trong benchmark", 40000.0))
+    timed("delete", lambda i: backend.delete(f"MÓN MỚI {i}"))
+    return timings
+
+
+def concurrent_adder(kind: str, path: str, worker: int, count: int):
+    backend = open_backend(kind, path)
+    for index in range(count):
+        backend.add(f"Món của worker {worker} số {index}", "", 10000.0)
+
+
+def lost_writes(kind: str, path: str, base_count: int, workers: int, per_worker: int) -> int:
+    processes = [
+        multiprocessing.Process(target=concurrent_adder, args=(kind, path, worker, per_worker))
+        for worker in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    backend = open_backend(kind, path)
+    final_count = len(backend.load()) if kind == "json" else backend.count()
+    return base_count + workers * per_worker - final_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--operations", type=int, default=200, help="operations timed per kind")
+    parser.add_argument("--workers", type=int, default=4, help="processes adding dishes concurrently")
+    parser.add_argument("--per-worker", type=int, default=50)
+    args = parser.parse_args()
+
+    items = make_items(args.items)
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "menu.json")
+        JsonMenu(json_path).save(items)
+        started = time.perf_counter()
+        store = MenuStore(os.path.join(tmp, "menu.sqlite3"), legacy_json_path=json_path)
+        print(f"migrated {store.count()} items from menu.json in {time.perf_counter() - started:.2f}s")
+
+        results = {
+            "json": time_operations(JsonMenu(json_path), items, args.operations),
+            "sqlite": time_operations(store, items, args.operations),
+        }
+        print(f"\n{args.items} items, ms per operation")
+        print(f"{'operation':<10}{'menu.json':>12}{'sqlite':>12}{'speedup':>10}")
+        for label in results["json"]:
+            old, new = results["json"][label], results["sqlite"][label]
+            print(f"{label:<10}{old:>12.2f}{new:>12.3f}{old / new:>9.0f}x")
+
+        print(f"\n{args.workers} processes x {args.per_worker} concurrent adds")
+        for kind, path in (("json", json_path), ("sqlite", store.db_path)):
+            base_count = len(JsonMenu(json_path).load()) if kind == "json" else store.count()
+            print(f"{kind:<10}lost writes: {lost_writes(kind, path, base_count, args.workers, args.per_worker)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Wire-size and CPU benchmark for the `/stream` formats of the poem agent.
+
+Feeds synthetic Responses API events (the same event classes the SDK yields)
+through `event_stream` in `agent-poem.py` and measures bytes per token and
+process CPU time per stream for the full event envelopes and for the compact
+delta-only format, with and without orjson:
+
+    python benchmarks/poem_stream_format_benchmark.py --streams 2000 --tokens 120
+
+No OpenAI key or network access is used.
+"""
+import argparse
+import asyncio
+import importlib.util
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+from openai.types.responses import ResponseTextDeltaEvent
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import stream_framing  # noqa: E402
+
+SAMPLE_POEM = (
+    "\tĐầu lòng hai ả tố nga,\nThuý Kiều là chị, em là Thuý Vân.\n"
+    "\tMai cốt cách, tuyết tinh thần.\nMỗi người một vẻ, mười phân vẹn mười.\n"
+)
+
+
+def load_poem_agent():
+    spec = importlib.util.spec_from_file_location("agent_poem", os.path.join(REPO_ROOT, "agent-poem.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_events(tokens: int):
+    """Delta events of roughly one word each, then a completed event carrying usage."""
+    words = (SAMPLE_POEM * (tokens // 20 + 1)).split(" ")[:tokens]
+    events = [
+        ResponseTextDeltaEvent(
+            type="response.output_text.delta", item_id="msg_68a1f0c2b7d48190a3c5e1f2d4b6a8c0",
+            output_index=0, content_index=0, delta=word + " ", sequence_number=index + 4, logprobs=[],
+        )
+        for index, word in enumerate(words)
+    ]
+    usage = SimpleNamespace(input_tokens=420, output_tokens=len(words), total_tokens=420 + len(words))
+    events.append(SimpleNamespace(type="response.completed", response=SimpleNamespace(usage=usage)))
+    return events
+
+
+class FakeStream:
+    def __init__(self, events):
+        self._events = iter(events)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._events)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def close(self):
+        pass
+
+
+def fake_client(events):
+    async def create(**kwargs):
+        return FakeStream(events)
+    return SimpleNamespace(responses=SimpleNamespace(create=create))
+
+
+async def run_streams(agent, streams: int, compact: bool):
+    total_bytes = 0
+    for _ in range(streams):
+        async for line in agent.event_stream([{"role": "user", "content": "mùa thu"}], compact=compact):
+            total_bytes += len(line.encode("utf-8") if isinstance(line, str) else line)
+    return total_bytes
+
+
+def measure(agent, streams: int, tokens: int, compact: bool):
+    started = time.process_time()
+    total_bytes = asyncio.run(run_streams(agent, streams, compact))
+    cpu = time.process_time() - started
+    return total_bytes / (streams * tokens), cpu / streams * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=2000)
+    parser.add_argument("--tokens", type=int, default=120, help="delta events per stream")
+    args = parser.parse_args()
+
+    agent = load_poem_agent()
+    events = make_events(args.tokens)
+    agent.get_async_openai = lambda: fake_client(events)
+    orjson = stream_framing.orjson
+
+    runs = [("full", False, orjson), ("compact (json)", True, None)]
+    if orjson is not None:
+        runs.append(("compact (orjson)", True, orjson))
+    else:
+        print("orjson not installed; skipping the orjson run")
+
+    print(f"{'format':<18}{'bytes/token':>14}{'CPU ms/stream':>16}")
+    for name, compact, encoder in runs:
+        stream_framing.orjson = encoder
+        bytes_per_token, cpu_ms = measure(agent, args.streams, args.tokens, compact)
+        print(f"{name:<18}{bytes_per_token:>14.1f}{cpu_ms:>16.3f}")
+    stream_framing.orjson = orjson
+
+
+if __name__ == "__main__":
+    main()
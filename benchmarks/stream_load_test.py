@@ -0,0 +1,208 @@
+"""
+Load test for the token streaming endpoints.
+
+Starts a fake OpenAI-compatible upstream that streams tokens with a fixed delay,
+points the agents at it through OPENAI_BASE_URL and opens many concurrent
+streams against `/stream`. It runs the async endpoints next to a copy of the
+previous sync-generator implementation so the threadpool ceiling is visible:
+
+    python benchmarks/stream_load_test.py --concurrency 300 --tokens 40 --token-delay 0.05
+
+Needs uvicorn and httpx; no OpenAI key or network access is used.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = {
+    "sync-baseline": None,
+    "cv": "agent-cv-evaluator:app",
+    "poem": "agent-poem:app",
+}
+
+
+def run_fake_upstream(port: int, tokens: int, token_delay: float):
+    """OpenAI-compatible server streaming `tokens` chunks, `token_delay` seconds apart."""
+    import uvicorn
+    from fastapi import FastAPI
+    from fastapi.responses import StreamingResponse
+
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions():
+        async def stream():
+            for index in range(tokens):
+                await asyncio.sleep(token_delay)
+                chunk = {
+                    "id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": 0, "model": "bench",
+                    "choices": [{"index": 0, "delta": {"content": f"tok{index} "}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @app.post("/v1/responses")
+    async def responses():
+        async def stream():
+            for index in range(tokens):
+                await asyncio.sleep(token_delay)
+                event = {
+                    "type": "response.output_text.delta", "item_id": "msg_bench", "output_index": 0,
+                    "content_index": 0, "delta": f"tok{index} ", "sequence_number": index, "logprobs": [],
+                }
+                yield f"event: response.output_text.delta\ndata: {json.dumps(event)}\n\n"
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+
+
+def run_sync_baseline(port: int):
+    """The previous `/stream` implementation: a sync generator over the sync OpenAI client."""
+    import uvicorn
+    from fastapi import Body, FastAPI
+    from fastapi.responses import StreamingResponse
+    from openai import OpenAI
+
+    app = FastAPI()
+    client = OpenAI()
+
+    @app.post("/stream")
+    def stream_response(request: Dict = Body(...)):
+        def stream_generator():
+            stream = client.chat.completions.create(model="gpt-4.1", messages=request["input"], stream=True)
+            for chunk in stream:
+                if chunk.choices[0].delta.content is not None:
+                    yield json.dumps({"delta": chunk.choices[0].delta.content}) + "\n"
+        return StreamingResponse(stream_generator(), media_type="application/json")
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+
+
+async def wait_until_ready(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url, timeout=1.0)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not start")
+
+
+async def one_stream(client: httpx.AsyncClient, url: str, started: float) -> Dict[str, float]:
+    payload = {"input": [{"role": "user", "content": "Viết một bài thơ về mùa thu"}]}
+    first_byte = None
+    async with client.stream("POST", url, json=payload) as response:
+        response.raise_for_status()
+        async for _ in response.aiter_bytes():
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+    return {"ttfb": first_byte or 0.0, "total": time.perf_counter() - started}
+
+
+async def load(url: str, concurrency: int) -> Dict[str, float]:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(600.0)) as client:
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(one_stream(client, url, started) for _ in range(concurrency)), return_exceptions=True
+        )
+        wall = time.perf_counter() - started
+
+    ok = [result for result in results if isinstance(result, dict)]
+    ttfb = sorted(result["ttfb"] for result in ok)
+    totals = sorted(result["total"] for result in ok)
+
+    def pct(values: List[float], q: float) -> float:
+        return values[min(len(values) - 1, int(q * len(values)))] if values else float("nan")
+
+    return {
+        "ok": len(ok),
+        "errors": len(results) - len(ok),
+        "wall_s": wall,
+        "ttfb_p50": statistics.median(ttfb) if ttfb else float("nan"),
+        "ttfb_p95": pct(ttfb, 0.95),
+        "ttfb_max": ttfb[-1] if ttfb else float("nan"),
+        "total_p95": pct(totals, 0.95),
+    }
+
+
+def start_target(name: str, port: int, upstream_port: int):
+    env = dict(
+        os.environ,
+        OPENAI_BASE_URL=f"http://127.0.0.1:{upstream_port}/v1",
+        OPENAI_API_KEY="bench",
+        CACHE_DIR=os.path.join(REPO_ROOT, ".cache", "bench"),
+    )
+    if TARGETS[name] is None:
+        os.environ.update(env)
+        process = multiprocessing.Process(target=run_sync_baseline, args=(port,), daemon=True)
+        process.start()
+        return process
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", TARGETS[name], "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--backlog", "4096"],
+        cwd=REPO_ROOT,
+        env=env,
+    )
+
+
+def stop(process):
+    process.terminate()
+    if isinstance(process, subprocess.Popen):
+        process.wait(timeout=10)
+    else:
+        process.join(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--tokens", type=int, default=40, help="tokens per stream from the fake upstream")
+    parser.add_argument("--token-delay", type=float, default=0.05, help="seconds between upstream tokens")
+    parser.add_argument("--targets", nargs="+", choices=sorted(TARGETS), default=["sync-baseline", "cv", "poem"])
+    parser.add_argument("--port", type=int, default=18100)
+    args = parser.parse_args()
+
+    upstream_port = args.port
+    upstream = multiprocessing.Process(
+        target=run_fake_upstream, args=(upstream_port, args.tokens, args.token_delay), daemon=True
+    )
+    upstream.start()
+    asyncio.run(wait_until_ready(f"http://127.0.0.1:{upstream_port}/docs"))
+
+    ideal = args.tokens * args.token_delay
+    print(f"{args.concurrency} concurrent streams, {args.tokens} tokens x {args.token_delay}s (ideal ~{ideal:.2f}s per stream)")
+    print(f"{'target':<14}{'ok':>6}{'err':>6}{'wall s':>9}{'ttfb p50':>10}{'ttfb p95':>10}{'ttfb max':>10}{'total p95':>11}")
+    try:
+        for offset, name in enumerate(args.targets, start=1):
+            port = args.port + offset
+            target = start_target(name, port, upstream_port)
+            try:
+                asyncio.run(wait_until_ready(f"http://127.0.0.1:{port}/docs"))
+                stats = asyncio.run(load(f"http://127.0.0.1:{port}/stream", args.concurrency))
+            finally:
+                stop(target)
+            print(
+                f"{name:<14}{stats['ok']:>6}{stats['errors']:>6}{stats['wall_s']:>9.2f}"
+                f"{stats['ttfb_p50']:>10.2f}{stats['ttfb_p95']:>10.2f}{stats['ttfb_max']:>10.2f}{stats['total_p95']:>11.2f}"
+            )
+    finally:
+        stop(upstream)
+
+
+if __name__ == "__main__":
+    main()
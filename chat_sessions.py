@@ -0,0 +1,89 @@
+"""
+Server-side chat sessions so clients only send the newest message. Each session
+keeps a bounded history: once it exceeds the token budget the oldest turns are
+dropped, so the prompt stays roughly the same size however long the chat runs.
+Idle sessions expire and the number of sessions is capped. Sessions live in
+process memory, one store per worker, and are guarded by a lock because sync
+endpoints use the store from threadpool threads while streams use it from the
+event loop.
+"""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from token_utils import estimate_tokens
+
+CHAT_SESSION_TTL = float(os.environ.get("CHAT_SESSION_TTL", "1800"))
+CHAT_MAX_SESSIONS = int(os.environ.get("CHAT_MAX_SESSIONS", "10000"))
+CHAT_HISTORY_TOKEN_BUDGET = int(os.environ.get("CHAT_HISTORY_TOKEN_BUDGET", "2000"))
+
+
+class ChatSession:
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.history: List[Dict[str, str]] = []
+        self.dropped_turns = 0
+        self.last_used = time.time()
+
+    def history_tokens(self) -> int:
+        return sum(estimate_tokens(message["content"]) for message in self.history)
+
+
+class ChatSessionStore:
+    """In-memory sessions with idle expiry, LRU eviction and token-bounded history."""
+
+    def __init__(
+        self,
+        ttl_seconds: float = CHAT_SESSION_TTL,
+        max_sessions: int = CHAT_MAX_SESSIONS,
+        history_token_budget: int = CHAT_HISTORY_TOKEN_BUDGET,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.history_token_budget = history_token_budget
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _purge(self):
+        # Callers hold self._lock
+        cutoff = time.time() - self.ttl_seconds
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_used >= cutoff and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+
+    def get_or_create(self, session_id: Optional[str] = None) -> ChatSession:
+        """Returns the live session with this ID, or a new session if it is unknown or expired."""
+        with self._lock:
+            self._purge()
+            session = self._sessions.get(session_id) if session_id else None
+            if session is None:
+                session = ChatSession(uuid.uuid4().hex)
+                self._sessions[session.session_id] = session
+            session.last_used = time.time()
+            self._sessions.move_to_end(session.session_id)
+            return session
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        with self._lock:
+            self._purge()
+            return self._sessions.get(session_id)
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def append_turn(self, session: ChatSession, user_message: str, assistant_message: str):
+        """Adds a finished turn and drops the oldest turns while the history is over budget."""
+        with self._lock:
+            session.history.append({"role": "user", "content": user_message})
+            session.history.append({"role": "assistant", "content": assistant_message})
+            session.last_used = time.time()
+            # Always keep the latest turn, even if it alone exceeds the budget
+            while len(session.history) > 2 and session.history_tokens() > self.history_token_budget:
+                del session.history[:2]
+                session.dropped_turns += 1
@@ -0,0 +1,180 @@
+"""
+Clean-up of text extracted from CV PDFs before it is sent to the model: joins words
+broken by end-of-line hyphenation, drops page numbers and header/footer lines that
+repeat on every page, collapses whitespace and finally enforces a token budget by
+trimming the least useful CV sections first.
+
+Pages are separated by form feeds (PAGE_BREAK) in the extracted text; header/footer
+detection only looks at the first and last lines of each page, so repeated lines in
+the body of the CV (job titles, cities) are kept.
+"""
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from token_utils import CHARS_PER_TOKEN, estimate_tokens
+
+# 0 disables the budget
+CV_TOKEN_BUDGET = int(os.environ.get("CV_TOKEN_BUDGET", "6000"))
+PAGE_BREAK = "\f"
+# Non-blank lines at the top and at the bottom of a page that can be a header/footer
+BOILERPLATE_EDGE_LINES = int(os.environ.get("CV_BOILERPLATE_EDGE_LINES", "2"))
+BOILERPLATE_MAX_CHARS = 120
+
+TRUNCATION_MARKER = " …"
+
+_HYPHEN_BREAK_RE = re.compile(r"(\w)-\n[ \t]*([a-zà-ỹđ])", re.UNICODE)
+_SPACES_RE = re.compile(r"[ \t\u00a0\u200b]+")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+_DIGITS_RE = re.compile(r"\d+")
+# Explicit page numbers only ("Trang 2/3", "Page 2 of 3", "- 2 -", "2/3"); bare numbers are
+# removed only when they repeat at the same page edge (see remove_boilerplate)
+_PAGE_NUMBER_RE = re.compile(
+    r"^(?:(?:page|trang)\s*\d+(?:\s*(?:/|of|trên)\s*\d+)?|-\s*\d{1,3}\s*-|\d{1,3}\s*/\s*\d{1,3})$",
+    re.IGNORECASE,
+)
+
+# Lower number = kept longer when the CV has to be trimmed
+SECTION_PRIORITIES = [
+    (0, ("kinh nghiệm", "experience", "kỹ năng", "skills", "dự án", "projects", "công việc", "employment")),
+    (1, ("học vấn", "education", "chứng chỉ", "certificat", "giải thưởng", "awards", "mục tiêu", "objective",
+         "tóm tắt", "summary", "giới thiệu", "profile", "ngoại ngữ", "languages")),
+    (2, ("sở thích", "hobbies", "interests", "hoạt động", "activities", "tham chiếu", "người tham khảo",
+         "references", "thông tin thêm", "additional")),
+]
+DEFAULT_SECTION_PRIORITY = 1
+_MAX_HEADING_CHARS = 40
+
+
+def rejoin_hyphenation(text: str) -> str:
+    """Joins words split across lines by a trailing hyphen ("develop-\\nment" -> "development")."""
+    return _HYPHEN_BREAK_RE.sub(r"\1\2", text)
+
+
+def edge_indexes(lines: List[str], edge_lines: int = BOILERPLATE_EDGE_LINES) -> Dict[int, str]:
+    """Maps the first and last `edge_lines` non-blank lines of a page to "top" or "bottom"."""
+    non_blank = [index for index, line in enumerate(lines) if line]
+    if edge_lines <= 0:
+        return {}
+    edges = {index: "bottom" for index in non_blank[-edge_lines:]}
+    edges.update({index: "top" for index in non_blank[:edge_lines]})
+    return edges
+
+
+def boilerplate_key(line: str) -> str:
+    """Line with digits masked, so "Trang 1/3" and "Trang 2/3" count as the same footer."""
+    return _DIGITS_RE.sub("#", line.casefold())
+
+
+def remove_boilerplate(pages: List[List[str]]) -> Tuple[List[List[str]], int]:
+    """
+    Drops page numbers and header/footer lines from the edges of each page. A line is a
+    header/footer when it sits at the same edge (top or bottom) of more than half of the
+    pages, and at least two. Returns the kept lines per page and how many lines were removed.
+    """
+    edges = [edge_indexes(lines) for lines in pages]
+    pages_with_line = Counter()
+    for lines, page_edges in zip(pages, edges):
+        pages_with_line.update({
+            (edge, boilerplate_key(lines[index])) for index, edge in page_edges.items()
+            if len(lines[index]) <= BOILERPLATE_MAX_CHARS and not is_heading(lines[index])
+        })
+    min_pages = max(2, len(pages) // 2 + 1)
+    repeated = {key for key, count in pages_with_line.items() if count >= min_pages}
+
+    kept_pages, removed = [], 0
+    for lines, page_edges in zip(pages, edges):
+        drop = {
+            index for index, edge in page_edges.items()
+            if (edge, boilerplate_key(lines[index])) in repeated or _PAGE_NUMBER_RE.match(lines[index])
+        }
+        kept_pages.append([line for index, line in enumerate(lines) if index not in drop])
+        removed += len(drop)
+    return kept_pages, removed
+
+
+def is_heading(line: str) -> bool:
+    """Whether a line looks like a CV section heading ("KINH NGHIỆM LÀM VIỆC", "Skills:")."""
+    stripped = line.strip().rstrip(":")
+    if not stripped or len(stripped) > _MAX_HEADING_CHARS:
+        return False
+    lowered = stripped.casefold()
+    return any(keyword in lowered for _, keywords in SECTION_PRIORITIES for keyword in keywords)
+
+
+def section_priority(heading: str) -> int:
+    lowered = heading.casefold()
+    for priority, keywords in SECTION_PRIORITIES:
+        if any(keyword in lowered for keyword in keywords):
+            return priority
+    return DEFAULT_SECTION_PRIORITY
+
+
+def split_sections(text: str) -> List[Tuple[int, str]]:
+    """
+    Splits a CV into (priority, text) sections at recognised headings. The part
+    before the first heading (name and contact details) always has top priority.
+    """
+    sections: List[Tuple[int, List[str]]] = [(0, [])]
+    for line in text.split("\n"):
+        if is_heading(line):
+            sections.append((section_priority(line), [line]))
+        else:
+            sections[-1][1].append(line)
+    return [(priority, "\n".join(lines)) for priority, lines in sections if lines]
+
+
+def truncate_to_budget(text: str, token_budget: int) -> Tuple[str, bool]:
+    """
+    Trims the text to `token_budget` tokens, shortening the lowest-priority sections
+    first and, within a priority, the later ones first. Returns the text and whether it was cut.
+    """
+    if token_budget <= 0 or estimate_tokens(text) <= token_budget:
+        return text, False
+
+    sections = split_sections(text)
+    texts = [section_text for _, section_text in sections]
+    excess_chars = len(text) - int(token_budget * CHARS_PER_TOKEN)
+    for priority in sorted({priority for priority, _ in sections}, reverse=True):
+        for index in reversed([i for i, (p, _) in enumerate(sections) if p == priority]):
+            if excess_chars <= 0:
+                break
+            section_text = texts[index]
+            if len(section_text) <= excess_chars + len(TRUNCATION_MARKER):
+                texts[index] = ""
+                excess_chars -= len(section_text) + 1
+            else:
+                cut = section_text[:len(section_text) - excess_chars - len(TRUNCATION_MARKER)]
+                # Cut on a word boundary when one is close by
+                boundary = max(cut.rfind(" "), cut.rfind("\n"))
+                if boundary > len(cut) * 0.8:
+                    cut = cut[:boundary]
+                texts[index] = cut.rstrip() + TRUNCATION_MARKER
+                excess_chars = 0
+    return "\n".join(section_text for section_text in texts if section_text), True
+
+
+def normalize_cv_text(text: str, token_budget: int = CV_TOKEN_BUDGET) -> Tuple[str, Dict[str, int]]:
+    """
+    Normalises extracted CV text and enforces the token budget.
+    Returns the new text and token statistics for reporting.
+    """
+    tokens_before = estimate_tokens(text)
+    normalized = rejoin_hyphenation(text.replace("\r\n", "\n").replace("\r", "\n"))
+    pages = [
+        [_SPACES_RE.sub(" ", line).strip() for line in page.split("\n")]
+        for page in normalized.split(PAGE_BREAK)
+    ]
+    pages, boilerplate_removed = remove_boilerplate(pages)
+    normalized = _BLANK_LINES_RE.sub("\n\n", "\n".join(line for lines in pages for line in lines)).strip()
+    normalized, truncated = truncate_to_budget(normalized, token_budget)
+
+    tokens_after = estimate_tokens(normalized)
+    return normalized, {
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": tokens_before - tokens_after,
+        "boilerplate_lines_removed": boilerplate_removed,
+        "truncated": int(truncated),
+    }
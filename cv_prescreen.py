@@ -0,0 +1,72 @@
+"""
+Local, offline pre-screening of CVs against a job description. Every CV in a
+batch is turned into one row of a sparse TF-IDF matrix and scored by cosine
+similarity to the JD in a single matrix-vector product, so thousands of CVs
+are ranked in seconds before any LLM call is made.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from text_retrieval import tokenize
+
+
+def tfidf_similarity(documents: Sequence[str], query: str) -> np.ndarray:
+    """
+    Cosine similarity (0..1) between the query and every document, using sublinear
+    TF and smoothed IDF computed over the documents plus the query.
+    """
+    if not documents:
+        return np.zeros(0)
+
+    vocabulary: Dict[str, int] = {}
+    rows: List[int] = []
+    cols: List[int] = []
+    for row, text in enumerate([query, *documents]):
+        tokens = tokenize(text)
+        rows.extend([row] * len(tokens))
+        cols.extend(vocabulary.setdefault(token, len(vocabulary)) for token in tokens)
+
+    n_rows = len(documents) + 1
+    counts = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64))),
+        shape=(n_rows, max(1, len(vocabulary))),
+    )
+    counts.sum_duplicates()
+
+    doc_freqs = np.bincount(counts.indices, minlength=counts.shape[1])
+    idf = np.log((1 + n_rows) / (1 + doc_freqs)) + 1.0
+    counts.data = 1.0 + np.log(counts.data)
+    weighted = counts.multiply(idf).tocsr()
+
+    norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    normalized = sparse.diags(1.0 / norms) @ weighted
+
+    similarities = normalized[1:] @ normalized[0].T
+    return np.asarray(similarities.todense()).ravel()
+
+
+def shortlist(
+    documents: Sequence[str],
+    query: str,
+    threshold: Optional[float] = None,
+    top_n: Optional[int] = None,
+) -> Tuple[List[Tuple[int, float]], List[Tuple[int, float]]]:
+    """
+    Splits documents into (kept, dropped) lists of (index, score). A document is kept
+    if its score reaches `threshold` and it is among the `top_n` best; kept entries
+    are ordered by descending score, dropped entries keep their input order.
+    """
+    scores = tfidf_similarity(documents, query)
+    order = np.argsort(-scores, kind="stable")
+    if threshold is not None:
+        order = order[scores[order] >= threshold]
+    if top_n is not None:
+        order = order[:max(0, top_n)]
+
+    kept_set = set(order.tolist())
+    kept = [(int(index), round(float(scores[index]), 4)) for index in order]
+    dropped = [(index, round(float(scores[index]), 4)) for index in range(len(documents)) if index not in kept_set]
+    return kept, dropped
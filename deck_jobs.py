@@ -0,0 +1,163 @@
+"""
+Durable job store for background deck generation. Jobs live in a SQLite table so
+they survive worker restarts and can be claimed by workers in any process; the
+rendered decks are written next to it on the filesystem.
+"""
+import json
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from tiered_cache import CACHE_DIR
+
+# Pipeline stages in the order a slide goes through them; progress only moves forward
+SLIDE_STAGES = ["pending", "search_started", "search_finished", "llm_finished"]
+
+TERMINAL_STATUSES = ("done", "failed")
+
+
+class DeckJobStore:
+    """SQLite-backed queue of deck generation jobs with per-slide progress."""
+
+    def __init__(self, db_path: Optional[str] = None, results_dir: Optional[str] = None):
+        self.db_path = db_path or os.path.join(CACHE_DIR, "deck_jobs.sqlite3")
+        self.results_dir = results_dir or os.path.join(CACHE_DIR, "deck_jobs")
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        os.makedirs(self.results_dir, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+        finally:
+            conn.close()
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    request TEXT NOT NULL,
+                    progress TEXT NOT NULL,
+                    result_path TEXT,
+                    error TEXT,
+                    worker_id TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    finished_at REAL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+
+    @contextmanager
+    def _connect(self, immediate: bool = False) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            # BEGIN IMMEDIATE takes the write lock up front so claims are atomic across processes
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["request"] = json.loads(job["request"])
+        job["progress"] = json.loads(job["progress"])
+        return job
+
+    def result_path_for(self, job_id: str) -> str:
+        return os.path.join(self.results_dir, f"{job_id}.pptx")
+
+    def create(self, request: Dict[str, Any], slide_count: int) -> str:
+        """Queues a new job and returns its ID."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, request, progress, created_at, updated_at) VALUES (?, 'queued', ?, ?, ?, ?)",
+                (job_id, json.dumps(request, ensure_ascii=False), json.dumps(["pending"] * slide_count), now, now),
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def claim_next(self, worker_id: str, stale_after: float) -> Optional[Dict[str, Any]]:
+        """
+        Atomically takes the oldest queued job. Running jobs whose worker has not
+        reported progress for `stale_after` seconds (e.g. it was restarted) are taken over.
+        """
+        now = time.time()
+        with self._connect(immediate=True) as conn:
+            row = conn.execute(
+                """
+                SELECT * FROM jobs
+                WHERE status = 'queued' OR (status = 'running' AND updated_at < ?)
+                ORDER BY created_at LIMIT 1
+                """,
+                (now - stale_after,),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker_id = ?, updated_at = ? WHERE id = ?",
+                (worker_id, now, row["id"]),
+            )
+        job = self._to_dict(row)
+        job.update(status="running", worker_id=worker_id)
+        return job
+
+    def record_progress(self, job_id: str, slide_index: int, stage: str):
+        """Moves a slide forward to `stage` and refreshes the job heartbeat."""
+        with self._connect(immediate=True) as conn:
+            row = conn.execute("SELECT progress FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            progress = json.loads(row["progress"])
+            if 0 <= slide_index < len(progress) and SLIDE_STAGES.index(stage) > SLIDE_STAGES.index(progress[slide_index]):
+                progress[slide_index] = stage
+            conn.execute(
+                "UPDATE jobs SET progress = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(progress), time.time(), job_id),
+            )
+
+    def complete(self, job_id: str, result_path: str):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'done', result_path = ?, updated_at = ?, finished_at = ? WHERE id = ?",
+                (result_path, now, now, job_id),
+            )
+
+    def fail(self, job_id: str, error: str):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated_at = ?, finished_at = ? WHERE id = ?",
+                (error, now, now, job_id),
+            )
+
+    def purge_expired(self, ttl_seconds: float) -> int:
+        """Deletes finished jobs (and their decks) older than the TTL; returns how many were removed."""
+        cutoff = time.time() - ttl_seconds
+        with self._connect() as conn:
+            rows: List[sqlite3.Row] = conn.execute(
+                "SELECT id, result_path FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (*TERMINAL_STATUSES, cutoff),
+            ).fetchall()
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(row["id"],) for row in rows])
+        for row in rows:
+            if row["result_path"] and os.path.exists(row["result_path"]):
+                os.remove(row["result_path"])
+        return len(rows)
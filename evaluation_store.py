@@ -0,0 +1,180 @@
+"""
+Durable history of CV evaluations in SQLite. Every evaluation computed by the
+model is recorded with the hashes of its inputs, per-criterion scores, total,
+model, latency and token usage, so past results can be listed, ranked per job
+description and served again instead of being recomputed.
+"""
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from tiered_cache import CACHE_DIR
+
+EVALUATION_KINDS = ("evaluation", "scores")
+
+
+class EvaluationStore:
+    """SQLite table of evaluation results indexed by JD hash and CV hash."""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.path.join(CACHE_DIR, "evaluation_history.sqlite3")
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS evaluations (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    cv_hash TEXT NOT NULL,
+                    jd_hash TEXT NOT NULL,
+                    criteria_hash TEXT NOT NULL,
+                    criteria TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    candidate_id TEXT,
+                    candidate_name TEXT,
+                    scores TEXT,
+                    total_score REAL,
+                    classification TEXT,
+                    summary TEXT,
+                    result_text TEXT,
+                    latency_ms INTEGER,
+                    prompt_tokens INTEGER,
+                    completion_tokens INTEGER,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_evaluations_jd ON evaluations (jd_hash, total_score DESC)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_evaluations_cv ON evaluations (cv_hash, jd_hash, created_at DESC)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        evaluation = dict(row)
+        evaluation["criteria"] = json.loads(evaluation["criteria"])
+        evaluation["scores"] = json.loads(evaluation["scores"]) if evaluation["scores"] else None
+        return evaluation
+
+    def record(
+        self,
+        kind: str,
+        cv_hash: str,
+        jd_hash: str,
+        criteria_hash: str,
+        criteria: List[Dict[str, Any]],
+        model: str,
+        candidate_id: Optional[str] = None,
+        candidate_name: Optional[str] = None,
+        scores: Optional[List[Dict[str, Any]]] = None,
+        total_score: Optional[float] = None,
+        classification: Optional[str] = None,
+        summary: Optional[str] = None,
+        result_text: Optional[str] = None,
+        latency_ms: Optional[int] = None,
+        prompt_tokens: Optional[int] = None,
+        completion_tokens: Optional[int] = None,
+    ) -> int:
+        """Saves one evaluation and returns its ID."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                """
+                INSERT INTO evaluations (
+                    kind, cv_hash, jd_hash, criteria_hash, criteria, model, candidate_id, candidate_name,
+                    scores, total_score, classification, summary, result_text,
+                    latency_ms, prompt_tokens, completion_tokens, created_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    kind, cv_hash, jd_hash, criteria_hash, json.dumps(criteria, ensure_ascii=False), model,
+                    candidate_id, candidate_name,
+                    json.dumps(scores, ensure_ascii=False) if scores is not None else None,
+                    total_score, classification, summary, result_text,
+                    latency_ms, prompt_tokens, completion_tokens, time.time(),
+                ),
+            )
+            return cursor.lastrowid
+
+    def get(self, evaluation_id: int) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM evaluations WHERE id = ?", (evaluation_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(
+        self,
+        jd_hash: Optional[str] = None,
+        cv_hash: Optional[str] = None,
+        kind: Optional[str] = None,
+        limit: int = 50,
+        offset: int = 0,
+    ) -> List[Dict[str, Any]]:
+        """Most recent evaluations first, optionally filtered by JD, CV and kind."""
+        conditions, params = [], []
+        for column, value in (("jd_hash", jd_hash), ("cv_hash", cv_hash), ("kind", kind)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM evaluations {where} ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                (*params, limit, offset),
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def top_for_jd(self, jd_hash: str, limit: int = 10, criteria_hash: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Best scored evaluation of each distinct CV for a job description, highest total first."""
+        criteria_filter = "AND criteria_hash = ?" if criteria_hash else ""
+        params = (jd_hash, criteria_hash, limit) if criteria_hash else (jd_hash, limit)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT * FROM (
+                    SELECT *, ROW_NUMBER() OVER (
+                        PARTITION BY cv_hash ORDER BY total_score DESC, created_at DESC
+                    ) AS cv_rank
+                    FROM evaluations
+                    WHERE jd_hash = ? AND kind = 'scores' AND total_score IS NOT NULL {criteria_filter}
+                )
+                WHERE cv_rank = 1
+                ORDER BY total_score DESC
+                LIMIT ?
+                """,
+                params,
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def latest(
+        self,
+        kind: str,
+        cv_hash: str,
+        jd_hash: str,
+        model: str,
+        criteria_hash: Optional[str] = None,
+        limit: int = 1,
+    ) -> List[Dict[str, Any]]:
+        """Newest evaluations of this CV against this JD with the given model (and criteria, if set)."""
+        criteria_filter = "AND criteria_hash = ?" if criteria_hash else ""
+        params = (kind, cv_hash, jd_hash, model, *((criteria_hash,) if criteria_hash else ()), limit)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT * FROM evaluations
+                WHERE kind = ? AND cv_hash = ? AND jd_hash = ? AND model = ? {criteria_filter}
+                ORDER BY created_at DESC LIMIT ?
+                """,
+                params,
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
@@ -0,0 +1,41 @@
+"""
+Shared async OpenAI client for the FastAPI agents. One AsyncOpenAI instance per
+process, backed by a pooled httpx.AsyncClient, lets a single worker hold hundreds
+of concurrent token streams on the event loop instead of one threadpool thread each.
+"""
+import os
+from typing import Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "500"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("LLM_MAX_KEEPALIVE_CONNECTIONS", "100"))
+# Long read timeout: a stream may stay open for minutes while tokens trickle in
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", "600"))
+LLM_CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", "10"))
+
+_async_client: Optional[AsyncOpenAI] = None
+
+
+def get_async_openai() -> AsyncOpenAI:
+    """Returns the process-wide AsyncOpenAI client, creating it (and its connection pool) on first use."""
+    global _async_client
+    if _async_client is None:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        )
+        _async_client = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY", ""), http_client=http_client)
+    return _async_client
+
+
+async def close_async_openai():
+    """Closes the shared client and its pooled connections (call from the app shutdown hook)."""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
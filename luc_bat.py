@@ -0,0 +1,190 @@
+"""
+Incremental validator for lục bát poems. Text is fed in as it streams from the
+model; every completed line is checked for its syllable count (6 then 8,
+alternating) and for the rhyme positions: the last syllable of a 6-syllable
+line rhymes with the 6th syllable of the following 8-syllable line, whose last
+syllable rhymes with the end of the next 6-syllable line. Rhyme syllables must
+carry a "bằng" tone. Rhymes are compared on the syllable's rhyme part (initial
+consonant, tone and medial glide removed), with a small table of near rhymes
+(vần thông) treated as equal. Pure Python, no model or network needed.
+"""
+import os
+import re
+import unicodedata
+from typing import List, Optional
+
+# Lines before the first 6-syllable line that are accepted as a title or introduction
+POEM_MAX_INTRO_LINES = int(os.environ.get("POEM_MAX_INTRO_LINES", "2"))
+# After at least one couplet, a line longer than this is taken as closing prose, not verse
+PROSE_MIN_SYLLABLES = 11
+
+_SYLLABLE_RE = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+# Combining marks of the five marked tones; every other syllable has thanh ngang
+_TONE_MARKS = {
+    "\u0300": "huyền",
+    "\u0301": "sắc",
+    "\u0309": "hỏi",
+    "\u0303": "ngã",
+    "\u0323": "nặng",
+}
+BANG_TONES = ("ngang", "huyền")
+
+_ONSETS = (
+    "ngh", "ng", "nh", "ch", "gh", "gi", "kh", "ph", "th", "tr", "qu",
+    "b", "c", "d", "đ", "g", "h", "k", "l", "m", "n", "p", "r", "s", "t", "v", "x",
+)
+_VOWELS = set("aăâeêioôơuưy")
+
+# Near rhymes that lục bát traditionally accepts as rhyming
+NEAR_RHYMES = [
+    ("anh", "ênh", "inh"),
+    ("ang", "ăng", "âng", "ương"),
+    ("an", "ăn", "ân"),
+    ("am", "ăm", "âm"),
+    ("ay", "ây"),
+    ("au", "âu"),
+    ("ôi", "ơi", "ươi", "ai", "oi", "uôi"),
+    ("ong", "ông", "ung", "uông"),
+    ("ơn", "ôn", "on", "uôn", "ươn"),
+    ("en", "ên", "iên"),
+    ("eo", "êu", "iêu"),
+    ("im", "êm", "iêm"),
+]
+_RHYME_CLASS = {rhyme: group[0] for group in NEAR_RHYMES for rhyme in group}
+
+
+def split_tone(syllable: str):
+    """Returns the lower-cased syllable without its tone mark, and the tone name."""
+    tone = "ngang"
+    base = []
+    for char in unicodedata.normalize("NFD", syllable.casefold()):
+        if char in _TONE_MARKS:
+            tone = _TONE_MARKS[char]
+        else:
+            base.append(char)
+    return unicodedata.normalize("NFC", "".join(base)), tone
+
+
+def syllables(line: str) -> List[str]:
+    """Vietnamese syllables of a line (punctuation and numbering ignored)."""
+    return _SYLLABLE_RE.findall(line)
+
+
+def is_bang(syllable: str) -> bool:
+    return split_tone(syllable)[1] in BANG_TONES
+
+
+def rhyme_part(syllable: str) -> str:
+    """Rhyme class of a syllable: its rhyme without initial consonant, tone or medial glide."""
+    base, _ = split_tone(syllable)
+    rhyme = base
+    for onset in _ONSETS:
+        rest = base[len(onset):]
+        if base.startswith(onset) and any(char in _VOWELS for char in rest):
+            rhyme = rest
+            break
+    # Medial glide: "hoa" rhymes with "xa", "thuyền" with "liền"
+    if rhyme[:1] == "o" and rhyme[1:2] in ("a", "ă", "e"):
+        rhyme = rhyme[1:]
+    elif rhyme[:1] == "u" and rhyme[1:2] in ("y", "â", "ê", "ơ"):
+        rhyme = rhyme[1:]
+    if rhyme[:1] == "y":
+        rhyme = "i" + rhyme[1:]
+    return _RHYME_CLASS.get(rhyme, rhyme)
+
+
+def rhymes(first: str, second: str) -> bool:
+    return rhyme_part(first) == rhyme_part(second)
+
+
+class LucBatValidator:
+    """
+    Checks a lục bát poem line by line while it streams. `feed` returns a
+    description of the first violation (or None); `valid_prefix` is the text up to
+    the end of the last valid couplet, from which generation can be resumed.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.valid_prefix = ""
+        self.finished = False
+        self._line_start = 0
+        self._line_number = 0
+        self._intro_lines = 0
+        self._started = False
+        self._expected = 6
+        self._last_luc: Optional[List[str]] = None
+        self._last_bat: Optional[List[str]] = None
+
+    def feed(self, delta: str) -> Optional[str]:
+        """Adds streamed text and validates every line it completes."""
+        self.text += delta
+        while not self.finished:
+            line_end = self.text.find("\n", self._line_start)
+            if line_end < 0:
+                return None
+            violation = self._check_line(self.text[self._line_start:line_end], line_end + 1)
+            self._line_start = line_end + 1
+            if violation:
+                return violation
+        return None
+
+    def finish(self) -> Optional[str]:
+        """Validates the last line when the stream ends without a trailing newline."""
+        if self.finished or self._line_start >= len(self.text):
+            return None
+        violation = self._check_line(self.text[self._line_start:], len(self.text))
+        self._line_start = len(self.text)
+        return violation
+
+    def _check_line(self, line: str, end: int) -> Optional[str]:
+        words = syllables(line)
+        if not words:
+            # Blank lines before the poem or between stanzas are fine
+            if self._expected == 6:
+                self.valid_prefix = self.text[:end]
+            return None
+
+        if not self._started:
+            if len(words) != 6:
+                self._intro_lines += 1
+                if self._intro_lines > POEM_MAX_INTRO_LINES:
+                    return f"Bài thơ không bắt đầu bằng câu 6 chữ (dòng \"{line.strip()}\" có {len(words)} chữ)"
+                self.valid_prefix = self.text[:end]
+                return None
+            self._started = True
+
+        self._line_number += 1
+        if len(words) != self._expected:
+            if self._last_bat is not None and self._expected == 6 and len(words) >= PROSE_MIN_SYLLABLES:
+                self.finished = True
+                return None
+            return f"Câu {self._line_number} có {len(words)} chữ, cần {self._expected} chữ"
+
+        if self._expected == 6:
+            if self._last_bat is not None and not rhymes(self._last_bat[7], words[5]):
+                return f"Câu {self._line_number}: chữ \"{words[5]}\" không vần với \"{self._last_bat[7]}\" cuối câu 8 trước"
+            if not is_bang(words[5]):
+                return f"Câu {self._line_number}: chữ cuối \"{words[5]}\" phải mang thanh bằng"
+            self._last_luc = words
+            self._expected = 8
+        else:
+            if not rhymes(self._last_luc[5], words[5]):
+                return f"Câu {self._line_number}: chữ thứ 6 \"{words[5]}\" không vần với \"{self._last_luc[5]}\" cuối câu 6"
+            if not is_bang(words[5]) or not is_bang(words[7]):
+                return f"Câu {self._line_number}: chữ thứ 6 và thứ 8 phải mang thanh bằng"
+            self._last_bat = words
+            self._expected = 6
+            self.valid_prefix = self.text[:end]
+        return None
+
+
+if __name__ == "__main__":
+    # Offline check of a poem file: python luc_bat.py < poem.txt
+    import sys
+
+    validator = LucBatValidator()
+    violation = validator.feed(sys.stdin.read()) or validator.finish()
+    print(violation or "OK")
+    sys.exit(1 if violation else 0)
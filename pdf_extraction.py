@@ -0,0 +1,128 @@
+"""
+PDF text extraction shared by the CV evaluator and the presentation generator.
+Results are cached by the SHA-256 of the PDF bytes, so re-uploading the same
+file (e.g. the same CV across sessions) skips parsing entirely.
+
+Parsing is CPU-bound, so async endpoints use `extract_text_from_pdf_async`, which
+runs PyPDF2 in a process pool and splits long documents across workers by page
+range, keeping the event loop free for other requests.
+"""
+import asyncio
+import hashlib
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import PyPDF2
+
+from tiered_cache import TieredCache
+
+pdf_text_cache = TieredCache(
+    "pdf_text",
+    ttl_seconds=float(os.environ.get("PDF_CACHE_TTL", str(30 * 24 * 60 * 60))),
+    max_memory_items=int(os.environ.get("PDF_CACHE_MEMORY_ITEMS", "64")),
+    max_disk_items=int(os.environ.get("PDF_CACHE_DISK_ITEMS", "2000")),
+)
+
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Pages parsed per worker task; longer documents are fanned out across the pool
+PDF_PAGES_PER_TASK = int(os.environ.get("PDF_PAGES_PER_TASK", "16"))
+PDF_MAX_PAGES = int(os.environ.get("PDF_MAX_PAGES", "500"))
+PDF_MAX_UPLOAD_BYTES = int(os.environ.get("PDF_MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+PDF_UPLOAD_CHUNK_SIZE = int(os.environ.get("PDF_UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+class PDFExtractionError(ValueError):
+    """Raised when a PDF cannot be parsed."""
+
+
+class PDFTooLargeError(PDFExtractionError):
+    """Raised when an upload exceeds the size or page limits."""
+
+
+def pdf_sha256(pdf_file: bytes) -> str:
+    return hashlib.sha256(pdf_file).hexdigest()
+
+
+def parse_pdf_pages(pdf_file: bytes, start: int, end: int, max_pages: int = PDF_MAX_PAGES) -> Tuple[List[str], int]:
+    """
+    Parses pages [start, end) and returns their texts with the document's page count.
+    Runs inside pool workers, so it only takes and returns picklable values.
+    """
+    try:
+        pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_file))
+        page_count = len(pdf_reader.pages)
+        if page_count > max_pages:
+            raise PDFTooLargeError(f"File PDF có {page_count} trang, vượt quá giới hạn {max_pages} trang")
+        page_texts = [pdf_reader.pages[i].extract_text() or "" for i in range(start, min(end, page_count))]
+    except PDFExtractionError:
+        raise
+    except Exception as e:
+        raise PDFExtractionError(str(e)) from e
+    return page_texts, page_count
+
+
+def pages_cache_key(pdf_file: bytes) -> str:
+    return f"pages:{pdf_sha256(pdf_file)}"
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=max(1, PDF_WORKERS))
+    return _process_pool
+
+
+def shutdown_process_pool():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+async def extract_pages_from_pdf_async(pdf_file: bytes) -> List[str]:
+    """
+    Returns the text of each page of a PDF, served from the content-hash cache when
+    possible. The first page range is parsed in a pool worker, and if the document is
+    longer the remaining ranges are parsed in parallel by the other workers.
+    """
+    key = pages_cache_key(pdf_file)
+    cached = await asyncio.to_thread(pdf_text_cache.get, key)
+    if cached is not None:
+        return cached
+
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool()
+    first_pages, page_count = await loop.run_in_executor(
+        pool, parse_pdf_pages, pdf_file, 0, PDF_PAGES_PER_TASK, PDF_MAX_PAGES
+    )
+    remaining = await asyncio.gather(*(
+        loop.run_in_executor(pool, parse_pdf_pages, pdf_file, start, start + PDF_PAGES_PER_TASK, PDF_MAX_PAGES)
+        for start in range(PDF_PAGES_PER_TASK, page_count, PDF_PAGES_PER_TASK)
+    ))
+    page_texts = first_pages + [text for pages, _ in remaining for text in pages]
+
+    await asyncio.to_thread(pdf_text_cache.set, key, page_texts)
+    return page_texts
+
+
+async def extract_text_from_pdf_async(pdf_file: bytes) -> str:
+    """Text of all pages joined by newlines (page boundaries are not kept)."""
+    return "\n".join(await extract_pages_from_pdf_async(pdf_file)).strip()
+
+
+async def read_upload(file, max_bytes: Optional[int] = None, chunk_size: Optional[int] = None) -> bytes:
+    """Reads an upload (anything with `async read(size)`) in chunks, stopping once it exceeds `max_bytes`."""
+    max_bytes = max_bytes or PDF_MAX_UPLOAD_BYTES
+    chunk_size = chunk_size or PDF_UPLOAD_CHUNK_SIZE
+    chunks = []
+    total = 0
+    while chunk := await file.read(chunk_size):
+        total += len(chunk)
+        if total > max_bytes:
+            raise PDFTooLargeError(f"File vượt quá giới hạn {max_bytes // (1024 * 1024)} MB")
+        chunks.append(chunk)
+    return b"".join(chunks)
@@ -0,0 +1,103 @@
+"""
+Response cache for first-turn poem requests. Many users ask for a poem on the
+same few topics, so a finished poem is stored under its normalized request
+text and later replayed through the same stream instead of calling the model
+again. Each key keeps a small pool of variants: until the pool is full new
+requests still generate (and add) a poem, afterwards a random variant is
+replayed. Entries live in a TieredCache, so they expire after a TTL and are
+evicted LRU.
+"""
+import asyncio
+import hashlib
+import os
+import random
+import re
+import threading
+import unicodedata
+from typing import AsyncIterator, Dict, List, Optional
+
+from tiered_cache import TieredCache
+
+POEM_CACHE_TTL = float(os.environ.get("POEM_CACHE_TTL", str(7 * 24 * 60 * 60)))
+POEM_CACHE_VARIANTS = int(os.environ.get("POEM_CACHE_VARIANTS", "3"))
+POEM_CACHE_MEMORY_ITEMS = int(os.environ.get("POEM_CACHE_MEMORY_ITEMS", "256"))
+POEM_CACHE_DISK_ITEMS = int(os.environ.get("POEM_CACHE_DISK_ITEMS", "5000"))
+# Seconds between replayed chunks (one word each); 0 replays as fast as the client reads
+POEM_CACHE_REPLAY_DELAY = float(os.environ.get("POEM_CACHE_REPLAY_DELAY", "0.02"))
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]+", re.UNICODE)
+_SPACES_RE = re.compile(r"\s+")
+_CHUNK_RE = re.compile(r"\s*\S+\s*")
+
+
+def normalize_topic(text: str) -> str:
+    """Case-folded NFC text without punctuation and with single spaces: "Mùa thu!" -> "mùa thu"."""
+    text = unicodedata.normalize("NFC", text).casefold()
+    text = _PUNCTUATION_RE.sub(" ", text)
+    return _SPACES_RE.sub(" ", text).strip()
+
+
+def replay_chunks(text: str) -> List[str]:
+    """Word-sized chunks that concatenate back to `text`."""
+    return _CHUNK_RE.findall(text) or [text]
+
+
+async def paced(chunks: List[str], delay: float = POEM_CACHE_REPLAY_DELAY) -> AsyncIterator[str]:
+    for index, chunk in enumerate(chunks):
+        if delay > 0 and index:
+            await asyncio.sleep(delay)
+        yield chunk
+
+
+class PoemResponseCache:
+    """Pools of finished poems keyed by model, validation mode and normalized topic."""
+
+    def __init__(
+        self,
+        max_variants: int = POEM_CACHE_VARIANTS,
+        ttl_seconds: float = POEM_CACHE_TTL,
+        max_memory_items: int = POEM_CACHE_MEMORY_ITEMS,
+        max_disk_items: int = POEM_CACHE_DISK_ITEMS,
+    ):
+        self.max_variants = max_variants
+        self.cache = TieredCache(
+            "poems",
+            ttl_seconds=ttl_seconds,
+            max_memory_items=max_memory_items,
+            max_disk_items=max_disk_items,
+        )
+        self._lock = threading.Lock()
+        self._counters = {"replays": 0, "generated": 0}
+
+    @staticmethod
+    def key(topic: str, model: str, validated: bool) -> Optional[str]:
+        normalized = normalize_topic(topic)
+        if not normalized:
+            return None
+        raw = f"{model}\n{int(validated)}\n{normalized}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def pick(self, key: str) -> Optional[str]:
+        """A random cached variant once the pool is full, otherwise None so a new one is generated."""
+        variants = self.cache.get(key) or []
+        if len(variants) < self.max_variants:
+            return None
+        with self._lock:
+            self._counters["replays"] += 1
+        return random.choice(variants)
+
+    def add(self, key: str, text: str):
+        """Adds a finished poem to the pool, replacing the oldest variant when it is full."""
+        if not text.strip():
+            return
+        # Duplicates are kept: a model that keeps writing the same poem must still fill the pool
+        variants = self.cache.get(key) or []
+        variants = (variants + [text])[-self.max_variants:]
+        self.cache.set(key, variants)
+        with self._lock:
+            self._counters["generated"] += 1
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            counters = dict(self._counters)
+        return {**self.cache.stats(), **counters, "max_variants": self.max_variants}
@@ -0,0 +1,60 @@
+"""
+Cached Tavily search shared by every agent. Results are keyed by the normalised
+query and the search options, so regenerating a deck on the same topic (or the
+restaurant agent repeating a lookup) does not hit the Tavily API again.
+"""
+import hashlib
+import json
+import os
+from typing import Any, Dict
+
+from tiered_cache import TieredCache
+
+search_cache = TieredCache(
+    "search",
+    ttl_seconds=float(os.environ.get("SEARCH_CACHE_TTL", str(6 * 60 * 60))),
+    max_memory_items=int(os.environ.get("SEARCH_CACHE_MEMORY_ITEMS", "256")),
+    max_disk_items=int(os.environ.get("SEARCH_CACHE_DISK_ITEMS", "5000")),
+)
+
+
+def normalize_query(query: str) -> str:
+    """Case-folds the query and collapses whitespace."""
+    return " ".join(query.casefold().split())
+
+
+def search_cache_key(query: str, max_results: int, topic: str, include_raw_content: bool) -> str:
+    """Builds the cache key for one search call."""
+    key_data = {
+        "query": normalize_query(query),
+        "max_results": max_results,
+        "topic": topic,
+        "include_raw_content": include_raw_content,
+    }
+    return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def cached_search(
+    tavily_client,
+    query: str,
+    max_results: int = 5,
+    topic: str = "general",
+    include_raw_content: bool = False,
+) -> Dict[str, Any]:
+    """
+    Runs `tavily_client.search` through the shared cache.
+    Exceptions from Tavily propagate and are never cached.
+    """
+    key = search_cache_key(query, max_results, topic, include_raw_content)
+    cached = search_cache.get(key)
+    if cached is not None:
+        return cached
+
+    search_docs = tavily_client.search(
+        query,
+        max_results=max_results,
+        include_raw_content=include_raw_content,
+        topic=topic,
+    )
+    search_cache.set(key, search_docs)
+    return search_docs
@@ -0,0 +1,93 @@
+"""
+Shrinks Tavily responses before they are pasted into prompts: only the fields the
+model reads are kept, duplicate pages are dropped and snippets are trimmed to fit
+a token budget. Each call reports how many prompt tokens it saved.
+"""
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Tuple
+
+from token_utils import CHARS_PER_TOKEN, estimate_tokens
+
+SEARCH_RESULTS_TOKEN_BUDGET = int(os.environ.get("SEARCH_RESULTS_TOKEN_BUDGET", "1500"))
+
+# Fields of a Tavily result that prompts actually use
+KEPT_FIELDS = ("title", "url", "content")
+
+
+def format_search_results(results: List[Dict[str, str]]) -> str:
+    """Serialises compacted results for a prompt, without indentation or ASCII escaping."""
+    return json.dumps(results, ensure_ascii=False, separators=(",", ":"))
+
+
+def _normalize_url(url: str) -> str:
+    return url.split("#", 1)[0].rstrip("/").lower()
+
+
+def _content_fingerprint(content: str) -> str:
+    return hashlib.sha1(" ".join(content.casefold().split()).encode("utf-8")).hexdigest()
+
+
+def _trim(text: str, max_chars: int) -> str:
+    """Cuts text to max_chars on a word boundary."""
+    if len(text) <= max_chars:
+        return text
+    if max_chars <= 1:
+        return ""
+    cut = text[: max_chars - 1]
+    if " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut + "…"
+
+
+def compact_search_results(
+    search_results: Dict[str, Any],
+    token_budget: int = SEARCH_RESULTS_TOKEN_BUDGET,
+) -> Tuple[List[Dict[str, str]], Dict[str, int]]:
+    """
+    Returns the compacted results (most relevant first) and stats with
+    `tokens_before`, `tokens_after`, `tokens_saved`, `results_kept` and `duplicates_dropped`.
+    `tokens_before` is measured against the previous `json.dumps(..., indent=2)` format.
+    """
+    tokens_before = estimate_tokens(json.dumps(search_results, indent=2)) if search_results else 0
+    raw_results = (search_results.get("results") or []) if isinstance(search_results, dict) else []
+    ranked = sorted(
+        (result for result in raw_results if isinstance(result, dict)),
+        key=lambda result: result.get("score") or 0,
+        reverse=True,
+    )
+
+    seen_urls, seen_contents = set(), set()
+    unique: List[Dict[str, str]] = []
+    for result in ranked:
+        item = {field: str(result.get(field) or "").strip() for field in KEPT_FIELDS}
+        url_key = _normalize_url(item["url"])
+        content_key = _content_fingerprint(item["content"])
+        if (url_key and url_key in seen_urls) or (item["content"] and content_key in seen_contents):
+            continue
+        seen_urls.add(url_key)
+        seen_contents.add(content_key)
+        unique.append(item)
+
+    # Share the character budget across results, giving unused room to the ones after
+    remaining_chars = int(token_budget * CHARS_PER_TOKEN) - 2
+    compacted: List[Dict[str, str]] = []
+    for position, item in enumerate(unique):
+        overhead = len(format_search_results([dict(item, content="")]))
+        if overhead >= remaining_chars:
+            break
+        share = (remaining_chars - overhead) // (len(unique) - position)
+        item["content"] = _trim(item["content"], share)
+        compacted.append(item)
+        remaining_chars -= overhead + len(item["content"]) + 1
+
+    tokens_after = estimate_tokens(format_search_results(compacted)) if compacted else 0
+    stats = {
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": max(0, tokens_before - tokens_after),
+        "results_kept": len(compacted),
+        "duplicates_dropped": len(ranked) - len(unique),
+    }
+    return compacted, stats
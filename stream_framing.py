@@ -0,0 +1,196 @@
+"""
+Server-Sent Events framing for token streams. Model deltas are coalesced into
+larger frames (flushed after a short time window or once enough text is
+buffered) and every frame gets an event ID. Generation runs in its own task and
+frames are kept for a while, so a client that drops can reconnect with
+Last-Event-ID and continue where it left off.
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional: faster encoding of stream lines
+    orjson = None
+
+SSE_FLUSH_INTERVAL = float(os.environ.get("SSE_FLUSH_INTERVAL", "0.05"))
+SSE_FLUSH_CHARS = int(os.environ.get("SSE_FLUSH_CHARS", "80"))
+# How long finished streams stay available for resuming, and how many are kept
+SSE_RESUME_TTL = float(os.environ.get("SSE_RESUME_TTL", "300"))
+SSE_MAX_STREAMS = int(os.environ.get("SSE_MAX_STREAMS", "1000"))
+
+
+async def coalesce_deltas(
+    deltas: AsyncIterator[str],
+    flush_interval: float = SSE_FLUSH_INTERVAL,
+    max_chars: int = SSE_FLUSH_CHARS,
+) -> AsyncIterator[str]:
+    """
+    Merges consecutive deltas, yielding the buffer once `max_chars` is reached or
+    `flush_interval` seconds after its first delta, even if no new delta arrives.
+    If `deltas` raises, the buffered text is yielded before the error propagates.
+    """
+    iterator = deltas.__aiter__()
+    buffer: List[str] = []
+    buffered_chars = 0
+    deadline: Optional[float] = None
+    next_delta: Optional[asyncio.Future] = None
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            if next_delta is None:
+                next_delta = asyncio.ensure_future(iterator.__anext__())
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            done, _ = await asyncio.wait({next_delta}, timeout=timeout)
+            if not done:
+                yield "".join(buffer)
+                buffer, buffered_chars, deadline = [], 0, None
+                continue
+
+            try:
+                delta = next_delta.result()
+            except StopAsyncIteration:
+                break
+            except Exception:
+                # Deliver the text received so far before the error reaches the client
+                if buffer:
+                    yield "".join(buffer)
+                    buffer, buffered_chars, deadline = [], 0, None
+                raise
+            finally:
+                if next_delta.done():
+                    next_delta = None
+            if not delta:
+                continue
+            buffer.append(delta)
+            buffered_chars += len(delta)
+            if deadline is None:
+                deadline = loop.time() + flush_interval
+            if buffered_chars >= max_chars:
+                yield "".join(buffer)
+                buffer, buffered_chars, deadline = [], 0, None
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        if next_delta is not None:
+            next_delta.cancel()
+
+
+def encode_json_line(data: dict) -> bytes:
+    """One NDJSON line, encoded with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data) + b"\n"
+    return (json.dumps(data, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def sse_event(data: dict, event: Optional[str] = None, event_id: Optional[str] = None) -> str:
+    """Formats one SSE event with a JSON payload."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def parse_event_id(last_event_id: Optional[str]) -> Tuple[Optional[str], int]:
+    """Splits a "<stream_id>:<seq>" event ID; returns (None, 0) when it is missing or malformed."""
+    if not last_event_id or ":" not in last_event_id:
+        return None, 0
+    stream_id, _, seq = last_event_id.rpartition(":")
+    try:
+        return stream_id, max(0, int(seq))
+    except ValueError:
+        return None, 0
+
+
+class ResumableStream:
+    """SSE frames of one generation, readable from any position while it is still being produced."""
+
+    def __init__(self, stream_id: str):
+        self.stream_id = stream_id
+        self.frames: List[str] = []
+        self.done = False
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Condition()
+
+    async def append(self, data: dict, event: str):
+        async with self._changed:
+            self.frames.append(sse_event(data, event=event, event_id=f"{self.stream_id}:{len(self.frames) + 1}"))
+            self._changed.notify_all()
+
+    async def finish(self):
+        async with self._changed:
+            self.done = True
+            self.finished_at = time.time()
+            self._changed.notify_all()
+
+    async def frames_after(self, seq: int = 0) -> AsyncIterator[str]:
+        """Yields every frame after event number `seq`, then live frames until the stream ends."""
+        index = seq
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: len(self.frames) > index or self.done)
+                new_frames = self.frames[index:]
+                done = self.done
+            for frame in new_frames:
+                yield frame
+            index += len(new_frames)
+            if done and index >= len(self.frames):
+                return
+
+
+class StreamRegistry:
+    """In-process registry of resumable streams with TTL and size-bounded eviction."""
+
+    def __init__(self, ttl_seconds: float = SSE_RESUME_TTL, max_streams: int = SSE_MAX_STREAMS):
+        self.ttl_seconds = ttl_seconds
+        self.max_streams = max_streams
+        self._streams: "OrderedDict[str, ResumableStream]" = OrderedDict()
+
+    def _purge(self):
+        now = time.time()
+        for stream_id, stream in list(self._streams.items()):
+            if stream.done and now - stream.finished_at > self.ttl_seconds:
+                del self._streams[stream_id]
+        while len(self._streams) > self.max_streams:
+            _, stream = self._streams.popitem(last=False)
+            if stream.task is not None and not stream.done:
+                stream.task.cancel()
+
+    def start(
+        self,
+        deltas: AsyncIterator[str],
+        flush_interval: float = SSE_FLUSH_INTERVAL,
+        max_chars: int = SSE_FLUSH_CHARS,
+    ) -> ResumableStream:
+        """Starts producing coalesced `delta` frames from `deltas`, ending with a `done` or `error` frame."""
+        self._purge()
+        stream = ResumableStream(uuid.uuid4().hex)
+
+        async def produce():
+            try:
+                async for text in coalesce_deltas(deltas, flush_interval, max_chars):
+                    await stream.append({"delta": text}, event="delta")
+                await stream.append({}, event="done")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await stream.append({"detail": str(e)}, event="error")
+            finally:
+                await stream.finish()
+
+        stream.task = asyncio.create_task(produce())
+        self._streams[stream.stream_id] = stream
+        return stream
+
+    def get(self, stream_id: str) -> Optional[ResumableStream]:
+        self._purge()
+        return self._streams.get(stream_id)
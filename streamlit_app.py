@@ -13,12 +13,21 @@ st.set_page_config(
 # URL của FastAPI backend
 FASTAPI_URL = "http://localhost:8000"
 
-def stream_chat_response(messages: list) -> Generator[str, None, None]:
+def stream_chat_response(message: str, validate_form: bool = False, use_cache: bool = False) -> Generator[str, None, None]:
     """
-    Gửi request đến FastAPI và nhận streaming response
+    Gửi tin nhắn mới đến FastAPI (lịch sử chat được lưu ở server theo session_id) và nhận streaming response.
+    Trả về toàn bộ nội dung đã nhận sau mỗi phần (server có thể yêu cầu quay lại câu hợp lệ cuối cùng)
     """
+    full_response = ""
     try:
-        payload = {"input": messages}
+        payload = {
+            "message": message,
+            "session_id": st.session_state.session_id,
+            "validate_form": validate_form,
+            # Chỉ nhận phần text của từng delta thay vì toàn bộ sự kiện
+            "stream_format": "compact",
+            "use_cache": use_cache
+        }
         
         with requests.post(
             f"{FASTAPI_URL}/stream",
@@ -27,6 +36,7 @@ def stream_chat_response(messages: list) -> Generator[str, None, None]:
             headers={"Content-Type": "application/json"}
         ) as response:
             response.raise_for_status()
+            st.session_state.session_id = response.headers.get("X-Session-Id", st.session_state.session_id)
             
             for line in response.iter_lines():
                 if line:
@@ -38,17 +48,28 @@ def stream_chat_response(messages: list) -> Generator[str, None, None]:
                             # delta là string, không phải object
                             content = data.get('delta', '')
                             if content:
-                                yield content
+                                full_response += content
+                                yield full_response
+                        elif isinstance(data, dict) and data.get('type') == 'poem.rollback':
+                            # Câu thơ sai luật: quay lại cặp câu hợp lệ cuối cùng, server sẽ viết tiếp
+                            full_response = data.get('text', '')
+                            yield full_response
+                        elif isinstance(data, dict) and data.get('type') == 'poem.validation':
+                            st.session_state.last_validation = data
+                        elif isinstance(data, dict) and data.get('type') == 'usage':
+                            st.session_state.last_usage = data
                         elif isinstance(data, str):
-                            yield data
+                            full_response += data
+                            yield full_response
                     except json.JSONDecodeError:
                         # Nếu không parse được JSON, yield raw text
-                        yield line.decode('utf-8')
+                        full_response += line.decode('utf-8')
+                        yield full_response
                         
     except requests.exceptions.RequestException as e:
-        yield f"❌ Lỗi kết nối: {str(e)}"
+        yield full_response + f"❌ Lỗi kết nối: {str(e)}"
     except Exception as e:
-        yield f"❌ Lỗi: {str(e)}"
+        yield full_response + f"❌ Lỗi: {str(e)}"
 
 def main():
     st.title("🤖 AI Chat Assistant")
@@ -57,6 +78,8 @@ def main():
     # Khởi tạo session state
     if "messages" not in st.session_state:
         st.session_state.messages = []
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = None
     
     # Sidebar với các tùy chọn
     with st.sidebar:
@@ -64,9 +87,24 @@ def main():
         
         # Button để xóa lịch sử chat
         if st.button("🗑️ Xóa lịch sử chat", type="secondary"):
+            if st.session_state.session_id:
+                try:
+                    requests.delete(f"{FASTAPI_URL}/sessions/{st.session_state.session_id}", timeout=2)
+                except requests.exceptions.RequestException:
+                    pass
             st.session_state.messages = []
+            st.session_state.session_id = None
             st.rerun()
         
+        validate_form = st.checkbox(
+            "Kiểm tra luật lục bát khi stream",
+            help="Server kiểm tra số chữ và vần từng câu, tự viết lại từ cặp câu hợp lệ cuối cùng nếu sai luật"
+        )
+        use_cache = st.checkbox(
+            "Dùng lại thơ đã lưu cho chủ đề quen thuộc",
+            help="Với tin nhắn đầu tiên, server phát lại một bài thơ đã viết cho cùng chủ đề thay vì gọi model"
+        )
+        
         st.markdown("---")
         st.markdown("### 📝 Hướng dẫn")
         st.markdown("""
@@ -106,12 +144,6 @@ def main():
         with st.chat_message("user"):
             st.markdown(prompt)
         
-        # Chuẩn bị messages để gửi đến API
-        api_messages = [
-            {"role": msg["role"], "content": msg["content"]} 
-            for msg in st.session_state.messages
-        ]
-        
         # Hiển thị response của AI với streaming
         with st.chat_message("assistant"):
             message_placeholder = st.empty()
@@ -121,12 +153,21 @@ def main():
             with st.spinner("AI đang suy nghĩ..."):
                 try:
                     # Stream response từ FastAPI
-                    for chunk in stream_chat_response(api_messages):
-                        full_response += chunk
+                    st.session_state.last_validation = None
+                    st.session_state.last_usage = None
+                    for full_response in stream_chat_response(prompt, validate_form, use_cache):
                         message_placeholder.markdown(full_response + "▌")
                     
                     # Hiển thị response hoàn chỉnh
                     message_placeholder.markdown(full_response)
+                    validation = st.session_state.last_validation
+                    if validation and validation["retries"]:
+                        st.caption(f"Đã viết lại {validation['retries']} lần để đúng luật lục bát")
+                    usage = st.session_state.last_usage
+                    if usage and usage.get("cached"):
+                        st.caption("Bài thơ lấy từ bộ nhớ đệm, không tốn token")
+                    elif usage and usage["total_tokens"]:
+                        st.caption(f"Token: {usage['input_tokens']} vào, {usage['output_tokens']} ra")
                     
                 except Exception as e:
                     error_msg = f"❌ Lỗi: {str(e)}"
@@ -1,7 +1,9 @@
 import streamlit as st
 import requests
 import json
-from typing import Generator, List, Dict
+import hashlib
+from datetime import datetime
+from typing import Generator, List, Dict, Optional
 import io
 
 # Cấu hình trang
@@ -89,6 +91,10 @@ def stream_evaluation(cv_text: str, job_description: str, criteria: List[Dict])
             headers={"Content-Type": "application/json"}
         ) as response:
             response.raise_for_status()
+            st.session_state.cv_tokens = (
+                response.headers.get("X-CV-Tokens-Before"),
+                response.headers.get("X-CV-Tokens-After"),
+            )
             
             for line in response.iter_lines():
                 if line:
@@ -106,6 +112,139 @@ def stream_evaluation(cv_text: str, job_description: str, criteria: List[Dict])
     except Exception as e:
         yield f"❌ Lỗi: {str(e)}"
 
+def iter_sse_events(response) -> Generator[Dict, None, None]:
+    """
+    Đọc các sự kiện Server-Sent Events từ response (id, event, data JSON)
+    """
+    event = {"id": None, "event": "message", "data": []}
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if event["data"]:
+                yield {"id": event["id"], "event": event["event"], "data": json.loads("\n".join(event["data"]))}
+            event = {"id": None, "event": "message", "data": []}
+        elif line.startswith("id:"):
+            event["id"] = line[3:].strip()
+        elif line.startswith("event:"):
+            event["event"] = line[6:].strip()
+        elif line.startswith("data:"):
+            event["data"].append(line[5:].strip())
+
+def stream_evaluation_sse(cv_text: str, job_description: str, criteria: List[Dict], max_resumes: int = 3) -> Generator[str, None, None]:
+    """
+    Stream đánh giá CV qua SSE (token đã được gộp ở server), tự kết nối lại bằng Last-Event-ID nếu mất kết nối
+    """
+    payload = {
+        "cv_text": cv_text,
+        "job_description": job_description,
+        "criteria": criteria
+    }
+    stream_id, last_event_id = None, None
+    for attempt in range(max_resumes + 1):
+        try:
+            if stream_id is None:
+                response = requests.post(f"{FASTAPI_URL}/evaluate-cv/sse", json=payload, stream=True)
+            else:
+                headers = {"Last-Event-ID": last_event_id} if last_event_id else {}
+                response = requests.get(f"{FASTAPI_URL}/evaluate-cv/sse/{stream_id}", headers=headers, stream=True)
+            with response:
+                response.raise_for_status()
+                stream_id = response.headers.get("X-Stream-Id", stream_id)
+                if response.headers.get("X-CV-Tokens-Before"):
+                    st.session_state.cv_tokens = (
+                        response.headers.get("X-CV-Tokens-Before"),
+                        response.headers.get("X-CV-Tokens-After"),
+                    )
+                for event in iter_sse_events(response):
+                    last_event_id = event["id"] or last_event_id
+                    if event["event"] == "delta":
+                        yield event["data"]["delta"]
+                    elif event["event"] == "error":
+                        yield f"❌ Lỗi: {event['data'].get('detail', '')}"
+                        return
+                    elif event["event"] == "done":
+                        return
+        except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+            if stream_id is None or attempt == max_resumes:
+                yield f"❌ Lỗi kết nối: {str(e)}"
+                return
+        except requests.exceptions.RequestException as e:
+            yield f"❌ Lỗi kết nối: {str(e)}"
+            return
+
+def score_cv_criteria(cv_text: str, job_description: str, criteria: List[Dict]) -> Optional[Dict]:
+    """
+    Chấm điểm CV theo từng tiêu chí (JSON). Tiêu chí đã chấm trước đó được lấy từ bộ nhớ đệm của server
+    """
+    try:
+        payload = {
+            "cv_text": cv_text,
+            "job_description": job_description,
+            "criteria": criteria
+        }
+        response = requests.post(f"{FASTAPI_URL}/evaluate-cv/scores", json=payload)
+        if response.status_code == 200:
+            return response.json()
+        st.error(f"Lỗi chấm điểm: {response.json().get('detail', 'Unknown error')}")
+    except Exception as e:
+        st.error(f"Lỗi kết nối: {str(e)}")
+    return None
+
+def reweight_scores(criterion_scores: Dict, criteria: List[Dict]) -> Optional[Dict]:
+    """
+    Tính lại điểm tổng và phân loại cục bộ từ điểm từng tiêu chí đã có (không gọi API).
+    Trả về None nếu có tiêu chí mới hoặc mô tả đã thay đổi (cần chấm lại)
+    """
+    total = 0.0
+    for criterion in criteria:
+        scored = criterion_scores["scores"].get(criterion["name"])
+        if scored is None or scored["description"] != criterion["description"]:
+            return None
+        total += criterion["weight"] * scored["score"]
+    total = round(total, 2)
+    classification = criterion_scores["score_bands"][-1][1]
+    for threshold, label in criterion_scores["score_bands"]:
+        if total >= threshold:
+            classification = label
+            break
+    return {"total_score": total, "classification": classification}
+
+def get_saved_evaluations(job_description: str, limit: int = 10) -> Optional[Dict]:
+    """
+    Lấy các kết quả đã lưu trên server cho JD này: xếp hạng ứng viên và các lần đánh giá gần nhất
+    """
+    jd_hash = hashlib.sha256(job_description.encode("utf-8")).hexdigest()
+    try:
+        top = requests.get(f"{FASTAPI_URL}/evaluations/top", params={"jd_hash": jd_hash, "limit": limit})
+        recent = requests.get(f"{FASTAPI_URL}/evaluations", params={"jd_hash": jd_hash, "kind": "evaluation", "limit": limit})
+        top.raise_for_status()
+        recent.raise_for_status()
+        return {"ranking": top.json()["ranking"], "evaluations": recent.json()["evaluations"]}
+    except requests.exceptions.RequestException as e:
+        st.error(f"Lỗi kết nối: {str(e)}")
+    return None
+
+def stream_batch_evaluation(
+    files,
+    job_description: str,
+    criteria: List[Dict],
+    prescreen_threshold: Optional[float] = None,
+    shortlist_size: Optional[int] = None,
+) -> Generator[Dict, None, None]:
+    """
+    Gửi nhiều CV (PDF hoặc ZIP) để đánh giá hàng loạt và nhận từng kết quả dạng stream
+    """
+    upload_files = [("files", (file.name, file.getvalue(), file.type or "application/octet-stream")) for file in files]
+    data = {"job_description": job_description, "criteria": json.dumps(criteria, ensure_ascii=False)}
+    if prescreen_threshold is not None:
+        data["prescreen_threshold"] = str(prescreen_threshold)
+    if shortlist_size:
+        data["shortlist_size"] = str(shortlist_size)
+    with requests.post(f"{FASTAPI_URL}/evaluate-cv/batch-upload", data=data, files=upload_files, stream=True) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line:
+                yield json.loads(line.decode('utf-8'))
+
 def main():
     st.title("📄 CV Evaluator - Đánh giá CV")
     st.markdown("---")
@@ -117,6 +256,8 @@ def main():
         st.session_state.evaluation_result = ""
     if "criteria" not in st.session_state:
         st.session_state.criteria = get_default_criteria()
+    if "criterion_scores" not in st.session_state:
+        st.session_state.criterion_scores = None
     
     # Sidebar với cài đặt
     with st.sidebar:
@@ -136,11 +277,20 @@ def main():
         
         st.markdown("---")
         
+        use_sse = st.checkbox(
+            "Gộp token khi stream (SSE)",
+            value=True,
+            help="Server gộp nhiều token vào một sự kiện và cho phép kết nối lại khi mất mạng"
+        )
+        
+        st.markdown("---")
+        
         # Reset button
         if st.button("🔄 Reset tất cả", type="secondary"):
             st.session_state.cv_text = ""
             st.session_state.evaluation_result = ""
             st.session_state.criteria = get_default_criteria()
+            st.session_state.criterion_scores = None
             st.rerun()
         
         st.markdown("---")
@@ -271,7 +421,8 @@ def main():
                 
                 with st.spinner("AI đang đánh giá CV..."):
                     try:
-                        for chunk in stream_evaluation(
+                        stream_function = stream_evaluation_sse if use_sse else stream_evaluation
+                        for chunk in stream_function(
                             st.session_state.cv_text,
                             job_description,
                             criteria_config
@@ -282,10 +433,160 @@ def main():
                         # Hiển thị kết quả hoàn chỉnh
                         result_placeholder.markdown(full_result)
                         st.session_state.evaluation_result = full_result
+                        tokens_before, tokens_after = st.session_state.get("cv_tokens", (None, None))
+                        if tokens_before and tokens_after:
+                            st.caption(f"Token CV: {tokens_before} → {tokens_after} sau khi chuẩn hóa")
                         
                     except Exception as e:
                         st.error(f"❌ Lỗi đánh giá: {str(e)}")
+        
+        if st.button("🧮 Chấm điểm theo tiêu chí", use_container_width=True):
+            if not st.session_state.cv_text:
+                st.error("❌ Vui lòng upload và trích xuất CV trước!")
+            elif not job_description.strip():
+                st.error("❌ Vui lòng nhập mô tả công việc!")
+            elif abs(total_weight - 1.0) > 0.01:
+                st.error("❌ Tổng trọng số phải bằng 1.0!")
+            else:
+                with st.spinner("AI đang chấm điểm các tiêu chí..."):
+                    result = score_cv_criteria(st.session_state.cv_text, job_description, criteria_config)
+                if result:
+                    descriptions = {criterion["name"]: criterion["description"] for criterion in criteria_config}
+                    st.session_state.criterion_scores = {
+                        "candidate_name": result["candidate_name"],
+                        "summary": result["summary"],
+                        "score_bands": result["score_bands"],
+                        "scores": {
+                            item["criterion"]: {
+                                "score": item["score"],
+                                "reason": item["reason"],
+                                "description": descriptions.get(item["criterion"], ""),
+                            }
+                            for item in result["scores"]
+                            # Tiêu chí model bỏ sót không có điểm, lần chấm sau sẽ gửi lại
+                            if item["score"] is not None
+                        },
+                    }
+                    if result.get("missing_criteria"):
+                        st.warning(f"⚠️ AI chưa chấm được các tiêu chí: {', '.join(result['missing_criteria'])}. Hãy chấm điểm lại.")
+                    st.caption(
+                        f"Chấm mới {result['criteria_scored']} tiêu chí, dùng lại {result['criteria_cached']} tiêu chí đã chấm · "
+                        f"Token CV: {result['cv_tokens']['tokens_before']} → {result['cv_tokens']['tokens_after']}"
+                    )
     
+    # Điểm theo tiêu chí: đổi trọng số chỉ tính lại cục bộ, không gọi LLM
+    if st.session_state.criterion_scores:
+        criterion_scores = st.session_state.criterion_scores
+        st.markdown("### 🧮 Điểm theo tiêu chí")
+        if criterion_scores["candidate_name"]:
+            st.markdown(f"**Ứng viên:** {criterion_scores['candidate_name']}")
+        st.dataframe(
+            [
+                {"Tiêu chí": name, "Điểm": item["score"], "Lý do": item["reason"]}
+                for name, item in criterion_scores["scores"].items()
+            ],
+            use_container_width=True
+        )
+        reweighted = reweight_scores(criterion_scores, criteria_config)
+        if reweighted is None:
+            st.warning("⚠️ Có tiêu chí mới hoặc mô tả đã thay đổi, hãy chấm điểm lại (chỉ các tiêu chí đó được gửi tới AI)")
+        else:
+            st.metric("Điểm tổng theo trọng số hiện tại", f"{reweighted['total_score']}/10", reweighted["classification"])
+        if criterion_scores["summary"]:
+            st.markdown(f"**Nhận xét:** {criterion_scores['summary']}")
+    
+    # Kết quả đã lưu trên server, không mất khi tải lại trang
+    with st.expander("🗂️ Kết quả đã lưu cho JD này", expanded=False):
+        if not job_description.strip():
+            st.info("Nhập mô tả công việc để xem các kết quả đã lưu")
+        elif st.button("🔍 Tải kết quả đã lưu"):
+            saved = get_saved_evaluations(job_description)
+            if saved is not None:
+                if saved["ranking"]:
+                    st.subheader("🏆 Ứng viên điểm cao nhất")
+                    st.dataframe(
+                        [
+                            {
+                                "CV": item["candidate_id"] or item["cv_hash"][:12],
+                                "Ứng viên": item["candidate_name"],
+                                "Điểm": item["total_score"],
+                                "Phân loại": item["classification"],
+                                "Thời gian": datetime.fromtimestamp(item["created_at"]).strftime("%d/%m/%Y %H:%M"),
+                            }
+                            for item in saved["ranking"]
+                        ],
+                        use_container_width=True
+                    )
+                for item in saved["evaluations"]:
+                    evaluated_at = datetime.fromtimestamp(item["created_at"]).strftime("%d/%m/%Y %H:%M")
+                    st.markdown(f"**📊 Đánh giá lúc {evaluated_at} (CV {item['cv_hash'][:12]})**")
+                    st.markdown(item["result_text"] or "")
+                    st.markdown("---")
+                if not saved["ranking"] and not saved["evaluations"]:
+                    st.info("Chưa có kết quả nào được lưu cho JD này")
+    
+    # Đánh giá hàng loạt nhiều CV với cùng JD và tiêu chí
+    st.markdown("---")
+    with st.expander("📚 Đánh giá hàng loạt (nhiều CV)", expanded=False):
+        batch_files = st.file_uploader(
+            "Chọn nhiều file CV (PDF) hoặc file ZIP chứa các CV",
+            type=['pdf', 'zip'],
+            accept_multiple_files=True,
+            key="batch_files"
+        )
+        use_prescreen = st.checkbox(
+            "Sàng lọc sơ bộ (TF-IDF, không gọi LLM) trước khi đánh giá",
+            help="Loại các CV ít liên quan tới JD và chỉ gửi danh sách ngắn tới LLM"
+        )
+        prescreen_threshold, shortlist_size = None, None
+        if use_prescreen:
+            col_threshold, col_shortlist = st.columns(2)
+            with col_threshold:
+                prescreen_threshold = st.slider("Ngưỡng tương đồng tối thiểu", 0.0, 1.0, 0.05, 0.01)
+            with col_shortlist:
+                shortlist_size = st.number_input("Số CV tối đa gửi tới LLM (0 = không giới hạn)", min_value=0, value=50, step=10)
+        if st.button("🏁 Đánh giá & xếp hạng", disabled=not batch_files):
+            if not job_description.strip():
+                st.error("❌ Vui lòng nhập mô tả công việc!")
+            elif abs(total_weight - 1.0) > 0.01:
+                st.error("❌ Tổng trọng số phải bằng 1.0!")
+            else:
+                progress_bar = st.progress(0.0)
+                results_placeholder = st.empty()
+                finished = 0
+                rows = []
+                try:
+                    for event in stream_batch_evaluation(
+                        batch_files, job_description, criteria_config, prescreen_threshold, shortlist_size
+                    ):
+                        if event["event"] == "started":
+                            total = max(1, event["total"])
+                        elif event["event"] == "screened_out":
+                            finished += 1
+                            progress_bar.progress(finished / total, text=f"Đã đánh giá {finished}/{total} CV")
+                            rows.append({
+                                "CV": event["candidate_id"],
+                                "Ứng viên": "",
+                                "Điểm": None,
+                                "Phân loại": f"Bị loại khi sàng lọc (độ tương đồng {event['prescreen_score']})",
+                            })
+                            results_placeholder.dataframe(rows, use_container_width=True)
+                        elif event["event"] in ("result", "error"):
+                            finished += 1
+                            progress_bar.progress(finished / total, text=f"Đã đánh giá {finished}/{total} CV")
+                            rows.append({
+                                "CV": event["candidate_id"],
+                                "Ứng viên": event.get("candidate_name", ""),
+                                "Điểm": event.get("total_score"),
+                                "Phân loại": event.get("classification") or event.get("detail", ""),
+                            })
+                            results_placeholder.dataframe(rows, use_container_width=True)
+                        elif event["event"] == "leaderboard":
+                            st.subheader("🏆 Bảng xếp hạng")
+                            st.dataframe(event["ranking"], use_container_width=True)
+                except requests.exceptions.RequestException as e:
+                    st.error(f"❌ Lỗi kết nối: {str(e)}")
+
     # Hiển thị kết quả đã lưu (nếu có)
     if st.session_state.evaluation_result and not st.button:
         st.markdown("### 📊 Kết quả đánh giá gần nhất")
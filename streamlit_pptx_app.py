@@ -27,11 +27,16 @@ def main():
         st.header("⚙️ Tùy chọn")
         topic = st.text_input("Chủ đề bài trình bày:", placeholder="VD: Lịch sử trí tuệ nhân tạo")
         uploaded_file = st.file_uploader("Tải lên tài liệu PDF (tùy chọn)", type="pdf")
+        prefetch = st.checkbox(
+            "⚡ Chuẩn bị trước nội dung slide",
+            value=False,
+            help="Server bắt đầu làm giàu nội dung các slide ngay sau khi tạo dàn ý, nên bài trình bày sẽ được tạo nhanh hơn nếu bạn giữ nguyên dàn ý."
+        )
 
         if st.button("📝 Tạo dàn ý", type="primary", disabled=not topic):
             with st.spinner("Đang phân tích và tìm kiếm thông tin để tạo dàn ý..."):
                 files = {'file': (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type)} if uploaded_file else None
-                data = {'topic': topic}
+                data = {'topic': topic, 'prefetch': str(prefetch).lower()}
                 
                 try:
                     response = requests.post(f"{FASTAPI_URL}/generate-outline", data=data, files=files)
@@ -69,20 +74,53 @@ def main():
                 slide['image_suggestion'] = st.text_input("Gợi ý hình ảnh", value=slide.get('image_suggestion', ''), key=f"img_{i}")
 
         if st.button("🚀 Tạo bài trình bày", type="primary"):
-            with st.spinner("Đang tạo file PowerPoint... Quá trình này có thể mất vài phút."):
-                try:
-                    payload = {"outline": st.session_state.outline}
-                    response = requests.post(f"{FASTAPI_URL}/generate-presentation", json=payload)
+            progress_bar = st.progress(0.0, text="Đang bắt đầu tạo bài trình bày...")
+            status_placeholder = st.empty()
+            preview_container = st.container()
+            try:
+                payload = {"outline": st.session_state.outline}
+                total_slides = len(st.session_state.outline)
+                finished_slides = 0
+                first_slide_ms = None
+
+                with requests.post(f"{FASTAPI_URL}/generate-presentation/stream", json=payload, stream=True) as response:
                     response.raise_for_status()
-                    
-                    # Save the pptx file to session state
-                    st.session_state.pptx_file = io.BytesIO(response.content)
-                    st.success("Tạo bài trình bày thành công!")
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        event = json.loads(line.decode('utf-8'))
+                        event_type = event.get("event")
 
-                except requests.exceptions.RequestException as e:
-                    st.error(f"Lỗi kết nối khi tạo bài trình bày: {e}")
-                except Exception as e:
-                    st.error(f"Đã xảy ra lỗi không mong muốn khi tạo bài trình bày: {e}")
+                        if event_type == "search_started":
+                            status_placeholder.info(f"🔎 Đang tìm kiếm thông tin cho slide {event['slide_index'] + 1}...")
+                        elif event_type == "llm_finished":
+                            finished_slides += 1
+                            if first_slide_ms is None:
+                                first_slide_ms = event["elapsed_ms"]
+                            progress_bar.progress(
+                                finished_slides / total_slides,
+                                text=f"Đã hoàn thành {finished_slides}/{total_slides} slide"
+                            )
+                            slide = event["slide"]
+                            with preview_container.expander(f"✅ Slide {event['slide_index'] + 1}: {slide['title']}"):
+                                for point in slide["points"]:
+                                    st.markdown(f"- {point}")
+                        elif event_type == "done":
+                            deck_response = requests.get(f"{FASTAPI_URL}{event['download_url']}")
+                            deck_response.raise_for_status()
+                            st.session_state.pptx_file = io.BytesIO(deck_response.content)
+                            timing = f"tổng thời gian {event['elapsed_ms'] / 1000:.1f}s"
+                            if first_slide_ms is not None:
+                                timing = f"slide đầu tiên sau {first_slide_ms / 1000:.1f}s, {timing}"
+                            cached_slides = event.get("cached_slides", [])
+                            if cached_slides:
+                                timing += f"; dùng lại {len(cached_slides)} slide không thay đổi, tạo mới {len(event.get('recomputed_slides', []))} slide"
+                            status_placeholder.success(f"Tạo bài trình bày thành công! ({timing})")
+
+            except requests.exceptions.RequestException as e:
+                st.error(f"Lỗi kết nối khi tạo bài trình bày: {e}")
+            except Exception as e:
+                st.error(f"Đã xảy ra lỗi không mong muốn khi tạo bài trình bày: {e}")
 
     if st.session_state.pptx_file:
         st.markdown("---")
@@ -0,0 +1,94 @@
+"""Offline checks of the lục bát validator against canonical verses; no model or network needed."""
+import pytest
+
+from luc_bat import LucBatValidator, rhyme_part, rhymes
+
+CA_DAO_CONG_CHA = (
+    "\tCông cha như núi Thái Sơn,\n"
+    "Nghĩa mẹ như nước trong nguồn chảy ra.\n"
+    "\tMột lòng thờ mẹ kính cha,\n"
+    "Cho tròn chữ hiếu mới là đạo con.\n"
+)
+
+KIEU_NGAY_XUAN = (
+    "\tNgày xuân con én đưa thoi,\n"
+    "Thiều quang chín chục đã ngoài sáu mươi.\n"
+    "\tCỏ non xanh tận chân trời,\n"
+    "Cành lê trắng điểm một vài bông hoa.\n"
+)
+
+KIEU_MO_DAU = (
+    "\tTrăm năm trong cõi người ta,\n"
+    "Chữ tài chữ mệnh khéo là ghét nhau.\n"
+    "\tTrải qua một cuộc bể dâu,\n"
+    "Những điều trông thấy mà đau đớn lòng.\n"
+    "\tLạ gì bỉ sắc tư phong,\n"
+    "Trời xanh quen thói má hồng đánh ghen.\n"
+    "\tCảo thơm lần giở trước đèn,\n"
+    "Phong tình cổ lục còn truyền sử xanh.\n"
+)
+
+KIEU_CHI_EM = (
+    "\tĐầu lòng hai ả tố nga,\n"
+    "Thuý Kiều là chị, em là Thuý Vân.\n"
+    "\tMai cốt cách, tuyết tinh thần.\n"
+    "Mỗi người một vẻ, mười phân vẹn mười.\n"
+)
+
+
+def validate(poem: str):
+    validator = LucBatValidator()
+    return validator.feed(poem) or validator.finish(), validator
+
+
+@pytest.mark.parametrize("poem", [CA_DAO_CONG_CHA, KIEU_NGAY_XUAN, KIEU_MO_DAU, KIEU_CHI_EM])
+def test_canonical_verses_are_valid(poem):
+    violation, validator = validate(poem)
+    assert violation is None
+    assert validator.valid_prefix == poem
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Sơn", "nguồn"),     # ơn / uôn
+    ("thoi", "ngoài"),    # oi / oai
+    ("đèn", "truyền"),    # en / iên
+    ("mươi", "trời"),     # ươi / ơi
+    ("phong", "hồng"),    # ong / ông
+    ("nhau", "dâu"),      # au / âu
+    ("hoa", "xa"),        # medial glide
+])
+def test_near_rhymes(first, second):
+    assert rhymes(first, second)
+
+
+@pytest.mark.parametrize("first, second", [("ta", "nhau"), ("đèn", "xanh"), ("thoi", "trăng")])
+def test_non_rhymes(first, second):
+    assert not rhymes(first, second)
+
+
+def test_rhyme_part_ignores_tone_and_initial():
+    assert rhyme_part("Thuyền") == rhyme_part("liền")
+
+
+def test_wrong_syllable_count_is_reported():
+    violation, _ = validate("\tTrăm năm trong cõi người ta,\nChữ tài chữ mệnh khéo là ghét.\n")
+    assert violation == "Câu 2 có 7 chữ, cần 8 chữ"
+
+
+def test_missing_rhyme_rolls_back_to_last_couplet():
+    first_couplet = "\tTrăm năm trong cõi người ta,\nChữ tài chữ mệnh khéo là ghét nhau.\n"
+    violation, validator = validate(first_couplet + "\tTrải qua một cuộc bể xanh,\n")
+    assert "không vần" in violation
+    assert validator.valid_prefix == first_couplet
+
+
+def test_rhyme_syllable_needs_bang_tone():
+    violation, _ = validate("\tTrăm năm trong cõi người tá,\n")
+    assert "thanh bằng" in violation
+
+
+def test_streamed_deltas_match_whole_text():
+    validator = LucBatValidator()
+    for start in range(0, len(KIEU_MO_DAU), 7):
+        assert validator.feed(KIEU_MO_DAU[start:start + 7]) is None
+    assert validator.finish() is None
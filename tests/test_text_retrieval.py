@@ -0,0 +1,84 @@
+"""Offline checks of PDF chunk retrieval for outline prompts; deterministic, no model or network needed."""
+import pytest
+
+import text_retrieval
+import token_utils
+from text_retrieval import BM25Index, chunk_text, select_relevant_chunks
+
+SEPARATOR = "\n...\n"
+
+
+@pytest.fixture(autouse=True)
+def five_chars_per_token(monkeypatch):
+    # With 4-letter words (5 characters with the space) one word is exactly one token
+    monkeypatch.setattr(text_retrieval, "CHARS_PER_TOKEN", 5.0)
+    monkeypatch.setattr(token_utils, "CHARS_PER_TOKEN", 5.0)
+
+
+def document(size: int, replacements=None) -> str:
+    """`size` distinct 4-letter words w000, w001, ... with some positions replaced."""
+    replacements = replacements or {}
+    return " ".join(replacements.get(index, f"w{index:03d}") for index in range(size))
+
+
+def word_range(start: int, end: int) -> str:
+    return " ".join(f"w{index:03d}" for index in range(start, end))
+
+
+def test_chunks_have_fixed_size_and_overlap():
+    chunks = chunk_text(document(20), chunk_tokens=8, overlap_tokens=3)
+    assert chunks == [word_range(0, 8), word_range(5, 13), word_range(10, 18), word_range(15, 20)]
+
+
+def test_chunks_cover_every_word_in_order():
+    chunks = chunk_text(document(1000), chunk_tokens=300, overlap_tokens=50)
+    words = chunks[0].split()
+    for chunk in chunks[1:]:
+        chunk_words = chunk.split()
+        assert chunk_words[:50] == words[-50:]
+        words += chunk_words[50:]
+    assert " ".join(words) == document(1000)
+
+
+def test_short_and_empty_text():
+    assert chunk_text(document(5), chunk_tokens=8, overlap_tokens=3) == [document(5)]
+    assert chunk_text("  \n ") == []
+
+
+def test_top_k_ranks_by_score():
+    index = BM25Index(["kiwi pear", "pear", "kiwi kiwi pear", "plum"])
+    ranked = [position for position, _ in index.top_k("kiwi", 4)]
+    assert ranked[:2] == [2, 0]
+    assert index.top_k("kiwi", 1)[0][0] == 2
+
+
+def test_top_k_ties_go_to_the_earlier_document():
+    index = BM25Index(["pear kiwi", "plum", "pear kiwi", "fig", "pear kiwi"])
+    assert [position for position, _ in index.top_k("kiwi", 5)] == [0, 2, 4, 1, 3]
+
+
+def test_text_within_budget_is_returned_unchanged():
+    text = document(100)
+    assert select_relevant_chunks(text, "kiwi", token_budget=100) == text
+
+
+def test_budget_cuts_off_equally_relevant_chunks_in_document_order():
+    # 400 words in chunks of 100 with a 50-word overlap: kiwi at 130 is in chunks 1 and 2,
+    # kiwi at 330 in chunks 5 and 6, all with the same score
+    text = document(400, {130: "kiwi", 330: "kiwi"})
+    chunks = chunk_text(text, chunk_tokens=100)
+    selected = select_relevant_chunks(text, "kiwi", top_k=8, token_budget=200, chunk_tokens=100)
+    assert selected.split(SEPARATOR) == [chunks[1], chunks[2]]
+
+
+def test_top_k_limits_selection_and_keeps_document_order():
+    text = document(400, {130: "kiwi", 330: "kiwi", 331: "kiwi"})
+    chunks = chunk_text(text, chunk_tokens=100)
+    selected = select_relevant_chunks(text, "kiwi", top_k=3, token_budget=350, chunk_tokens=100)
+    assert selected.split(SEPARATOR) == [chunks[1], chunks[5], chunks[6]]
+
+
+def test_best_chunk_is_kept_even_if_it_exceeds_the_budget():
+    text = document(400, {330: "kiwi"})
+    chunks = chunk_text(text, chunk_tokens=100)
+    assert select_relevant_chunks(text, "kiwi", top_k=8, token_budget=50, chunk_tokens=100) == chunks[5]
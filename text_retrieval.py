@@ -0,0 +1,100 @@
+"""
+In-memory lexical retrieval over long documents. A document is split into
+overlapping word chunks, indexed with BM25, and only the chunks most relevant
+to a query are kept. Everything is deterministic and runs offline.
+"""
+import math
+import re
+from collections import Counter
+from typing import List, Tuple
+
+from token_utils import CHARS_PER_TOKEN, estimate_tokens
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens; Vietnamese diacritics are kept as part of the word."""
+    return _WORD_RE.findall(text.casefold())
+
+
+def chunk_text(text: str, chunk_tokens: int = 300, overlap_tokens: int = 50) -> List[str]:
+    """Splits text into overlapping chunks of roughly `chunk_tokens` tokens, cut on word boundaries."""
+    words = text.split()
+    if not words:
+        return []
+    # Convert the token size into a word count using the average word length of this text
+    avg_word_chars = sum(len(word) + 1 for word in words) / len(words)
+    chunk_words = max(1, int(chunk_tokens * CHARS_PER_TOKEN / avg_word_chars))
+    step = max(1, chunk_words - int(overlap_tokens * CHARS_PER_TOKEN / avg_word_chars))
+
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + chunk_words]))
+        if start + chunk_words >= len(words):
+            break
+    return chunks
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of documents."""
+
+    def __init__(self, documents: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(tokenize(document)) for document in documents]
+        self.doc_lengths = [sum(freqs.values()) for freqs in self.term_freqs]
+        self.avg_doc_length = (sum(self.doc_lengths) / len(documents)) if documents else 0.0
+
+        doc_freqs: Counter = Counter()
+        for freqs in self.term_freqs:
+            doc_freqs.update(freqs.keys())
+        n_docs = len(documents)
+        self.idf = {
+            term: math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for term, df in doc_freqs.items()
+        }
+
+    def scores(self, query: str) -> List[float]:
+        """BM25 score of every document for the query."""
+        query_terms = tokenize(query)
+        results = []
+        for freqs, length in zip(self.term_freqs, self.doc_lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / (self.avg_doc_length or 1))
+            for term in query_terms:
+                tf = freqs.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            results.append(score)
+        return results
+
+    def top_k(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Indices and scores of the k best documents; ties go to the earlier document."""
+        ranked = sorted(enumerate(self.scores(query)), key=lambda item: (-item[1], item[0]))
+        return ranked[:k]
+
+
+def select_relevant_chunks(
+    text: str,
+    query: str,
+    top_k: int = 8,
+    token_budget: int = 3000,
+    chunk_tokens: int = 300,
+) -> str:
+    """
+    Returns the text unchanged if it fits `token_budget`, otherwise the `top_k` chunks
+    most relevant to `query` (within the budget), in their original document order.
+    """
+    if estimate_tokens(text) <= token_budget:
+        return text
+
+    chunks = chunk_text(text, chunk_tokens=chunk_tokens)
+    selected, used_tokens = [], 0
+    for index, _ in BM25Index(chunks).top_k(query, top_k):
+        chunk_tokens_used = estimate_tokens(chunks[index])
+        if selected and used_tokens + chunk_tokens_used > token_budget:
+            break
+        selected.append(index)
+        used_tokens += chunk_tokens_used
+    return "\n...\n".join(chunks[index] for index in sorted(selected))
@@ -0,0 +1,149 @@
+"""
+Shared two-tier cache used by the agents: a small in-process LRU in front of a
+SQLite table on disk, both bounded in size and expiring entries after a TTL.
+Values must be JSON-serialisable.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+CACHE_DIR = os.environ.get("CACHE_DIR", ".cache")
+
+
+class TieredCache:
+    """Memory + disk cache with TTL, size-bounded LRU eviction and hit/miss counters."""
+
+    def __init__(
+        self,
+        name: str,
+        ttl_seconds: float,
+        max_memory_items: int = 256,
+        max_disk_items: int = 10_000,
+        db_path: Optional[str] = None,
+    ):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        self.db_path = db_path or os.path.join(CACHE_DIR, f"{name}.sqlite3")
+
+        self._memory: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+        if self.max_disk_items > 0:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS entries (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        accessed_at REAL NOT NULL
+                    )
+                    """
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # One short-lived connection per call keeps the cache safe across threads and processes
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _count(self, counter: str, amount: int = 1):
+        with self._lock:
+            self._counters[counter] += amount
+
+    def _remember(self, key: str, created_at: float, value: Any):
+        with self._lock:
+            self._memory[key] = (created_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_items:
+                self._memory.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        """Returns the cached value or None on a miss / expired entry."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, value = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+        if self.max_disk_items > 0:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT value, created_at FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value_json, created_at = row
+                    if now - created_at <= self.ttl_seconds:
+                        conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+                        value = json.loads(value_json)
+                        self._remember(key, created_at, value)
+                        self._count("disk_hits")
+                        return value
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+        self._count("misses")
+        return None
+
+    def set(self, key: str, value: Any):
+        """Stores a value in both tiers, evicting least recently used entries past the limits."""
+        now = time.time()
+        self._remember(key, now, value)
+        self._count("stores")
+
+        if self.max_disk_items > 0:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), now, now),
+                )
+                conn.execute("DELETE FROM entries WHERE created_at < ?", (now - self.ttl_seconds,))
+                evicted = conn.execute(
+                    """
+                    DELETE FROM entries WHERE key IN (
+                        SELECT key FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                    )
+                    """,
+                    (self.max_disk_items,),
+                ).rowcount
+                if evicted:
+                    self._count("evictions", evicted)
+
+    def clear(self):
+        """Drops every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+        if self.max_disk_items > 0:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM entries")
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit/miss counters and current tier sizes."""
+        with self._lock:
+            stats = dict(self._counters, memory_items=len(self._memory))
+        if self.max_disk_items > 0:
+            with self._connect() as conn:
+                stats["disk_items"] = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        return {"name": self.name, **stats}
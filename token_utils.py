@@ -0,0 +1,15 @@
+"""
+Local token estimation shared by the agents. It avoids a tokenizer dependency and
+errs on the high side for Vietnamese text, which tokenizes denser than English.
+"""
+import math
+import os
+
+CHARS_PER_TOKEN = float(os.environ.get("CHARS_PER_TOKEN", "3.5"))
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimates how many model tokens `text` will use."""
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)